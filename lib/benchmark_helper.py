@@ -0,0 +1,192 @@
+import json
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.transpiler import PassManager, StagedPassManager
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit.providers import Backend
+from qiskit.providers.fake_provider import GenericBackendV2
+from qiskit.converters import circuit_to_dag
+from qiskit.dagcircuit import DAGCircuit
+
+from lib.distributed_coupling_map import REMOTE_LINK_WEIGHT, DistributedTopology, distributed_topology
+from lib.circuit_cache import CircuitCache
+from lib.interaction_mapping import two_qubit_interactions
+from lib.layout_cache import LayoutCache
+from lib.multi_trial import run_trials
+from lib.routing_validation import validate_routing
+from lib.transpiler_plugins import interaction_layout_stage, lookahead_routing_stage
+from lib.timer_helper import NULL_PROFILER, Profiler, Timer
+
+"""
+Benchmark steps of 5_benchmarking.ipynb, shared by the notebook and lib/benchmark_runner.py.
+Result tree: circuit_size -> benchmark_name -> 'init' | '{layout}_{num_qubits}_{num_group}' -> '{routing}_size', '{routing}_depth',
+'{routing}_swap' (CX gates of the inserted swaps, 3 per SWAP, the unit of result/benchmarking_FINAL.json), '{routing}_swap_gates' (inserted SWAP gates), '{routing}_interval',
+'{routing}_remote_swap' (swaps over an inter-group link), '{routing}_remote_ops' (two-qubit gates between groups, a swap counts as 3),
+'{routing}_profile' (Profiler.report() of the cell, only with profile=True),
+'{routing}_equivalent' and '{routing}_validation' (result and method of lib/routing_validation.py, only with validate=True)
+"""
+
+RESULT_FILE = "result/benchmarking_FINAL.json"
+
+def init_dict_benchmark(circuit_size_list, benchmark_name_list, dict_benchmark):
+    for circuit_size in circuit_size_list:
+        if str(circuit_size) not in dict_benchmark: # circuit size level
+            dict_benchmark[str(circuit_size)] = {}
+        for benchmark_name in benchmark_name_list:
+            if benchmark_name not in dict_benchmark[str(circuit_size)]: # benchmark name level
+                dict_benchmark[str(circuit_size)][benchmark_name] = {}
+            if 'init' not in dict_benchmark[str(circuit_size)][benchmark_name]: # coupling map level
+                dict_benchmark[str(circuit_size)][benchmark_name]['init'] = {}
+    return dict_benchmark
+
+def save_dict_to_file(dict_benchmark, filename=RESULT_FILE):
+    with(open(filename, "w") as outfile):
+        json.dump(dict_benchmark, outfile)
+
+def open_json_from_file(filename=RESULT_FILE):
+    with open(filename) as json_file:
+        return json.load(json_file)
+
+def start_initial_benchmark(benchmark_name: str, circuit_size: int, dict_benchmark: dict, cache: CircuitCache | None = None):
+    from mqt.bench import get_benchmark, CompilerSettings, QiskitSettings  # only needed for benchmarking
+
+    level = "nativegates"
+    optimization_level = 0
+
+    def generate():
+        compiler_settings = CompilerSettings(qiskit=QiskitSettings(optimization_level))
+        qc = get_benchmark(
+        benchmark_name=benchmark_name, level=level, circuit_size=circuit_size,
+        compiler="qiskit", compiler_settings=compiler_settings, provider_name="ibm"
+        )
+        qc.remove_final_measurements()
+        return qc
+
+    with Timer() as t:
+        if cache is None:
+            qc = generate()
+            interactions = two_qubit_interactions(circuit_to_dag(qc))
+        else:
+            # reuse a circuit generated by an earlier sweep with the same settings, with its interaction pairs
+            key = CircuitCache.key(benchmark_name, level, circuit_size, {"compiler": "qiskit", "optimization_level": optimization_level, "provider_name": "ibm"})
+            qc, interactions = cache.get_or_create(key, generate, lambda qc: two_qubit_interactions(circuit_to_dag(qc)))
+    init_dict_benchmark([circuit_size], [benchmark_name], dict_benchmark)
+    dict_benchmark[str(circuit_size)][benchmark_name]['init']['size'] = qc.size()
+    dict_benchmark[str(circuit_size)][benchmark_name]['init']['depth'] = qc.depth()
+    dict_benchmark[str(circuit_size)][benchmark_name]['init']['interval'] = t.interval
+
+    # TODO: remove measure because error in mapping physical wire -> logical qubit -> classical register
+    # the interaction pairs go to update_dict_size_depth, so the mapping does not build them from a DAG again
+    return qc, interactions
+
+def build_generic_backend(
+    layout_name: str, num_qubits: int, num_group: int # num_rows and num_cols only used in grid
+) ->  GenericBackendV2:
+    # memoized: every routing option of every benchmark shares one backend per layout
+    return distributed_topology(layout_name, num_qubits, num_group).backend
+
+def build_pass_manager(
+    routing_option: str, backend: Backend, best_layout=None, topology: DistributedTopology | None = None,
+    profiler: Profiler = NULL_PROFILER, mapping_options: dict | None = None, layout_cache: LayoutCache | None = None,
+    interactions: np.ndarray | None = None,
+) -> PassManager:
+    if routing_option == "lookahead":
+        # layout and routing stages only; without best_layout the layout stage runs InteractionMapping
+        coupling_map = topology or backend.coupling_map
+        pass_manager = StagedPassManager()
+        pass_manager.layout = interaction_layout_stage(coupling_map, best_layout, mapping_options, profiler, layout_cache, interactions)
+        pass_manager.routing = lookahead_routing_stage(coupling_map, profiler=profiler)
+
+    elif routing_option == "sabre":
+        pass_manager = generate_preset_pass_manager(
+            optimization_level=0,
+            backend=backend,
+            layout_method="sabre",
+            routing_method="sabre",
+        )
+    elif routing_option == "basic":
+        pass_manager = generate_preset_pass_manager(
+            optimization_level=0,
+            backend=backend,
+            layout_method="trivial",
+            routing_method="basic",
+        )
+    else:
+        raise Exception(f"Swap technique {routing_option} is not available yet.")
+    return pass_manager
+
+class SwapCounter:
+    # pm.run callback: keeps the (remote) swaps of the last DAG that still has SWAP gates,
+    # i.e. the routed circuit before the basis translation turns the swaps into CX gates
+    def __init__(self, topology: DistributedTopology):
+        self.topology = topology
+        self.swap = 0
+        self.remote_swap = 0
+
+    def __call__(self, pass_, dag, time, property_set, count):
+        self.update(dag)
+
+    def update(self, dag: DAGCircuit):
+        swaps = dag.named_nodes("swap")
+        if swaps:
+            self.swap = len(swaps)
+            self.remote_swap = int(sum(self.topology.is_remote(node.qargs[0]._index, node.qargs[1]._index) for node in swaps))
+
+def count_remote_operations(qc: QuantumCircuit, topology: DistributedTopology) -> int:
+    remote_ops = 0
+    for instruction in qc.data:
+        if len(instruction.qubits) == 2:
+            phy0, phy1 = (qc.find_bit(qubit).index for qubit in instruction.qubits)
+            if topology.is_remote(phy0, phy1):
+                remote_ops += 3 if instruction.operation.name == "swap" else 1
+    return remote_ops
+
+def layout_key(layout_name: str, num_qubits: int, num_group: int) -> str:
+    return f'{layout_name}_{num_qubits}_{num_group}'
+
+def update_dict_size_depth(
+    qc: QuantumCircuit, dag: DAGCircuit | None, layout_name, num_qubits, num_group, routing_option, dict_benchmark,
+    circuit_size: int, benchmark_name: str, mapping_options: dict | None = None, remote_weight: float = REMOTE_LINK_WEIGHT,
+    profile: bool = False, layout_cache: LayoutCache | None = None, validate: bool = False,
+    trials: int = 1, trial_workers: int | None = None, interactions: np.ndarray | None = None,
+):
+    # dag is only kept for the notebook signature; interactions (two-qubit pairs of qc, e.g. from CircuitCache)
+    # saves the lookahead layout stage from extracting them again
+    profiler = Profiler() if profile else NULL_PROFILER
+    with profiler.span("topology"):
+        topology = distributed_topology(layout_name, num_qubits, num_group, remote_weight)
+        backend = topology.backend
+    # lookahead: InteractionMapping runs inside the layout stage, so the interval covers mapping and routing
+    best_layout = [(idx, idx) for idx in range(qc.num_qubits)] if layout_name == 'full' else None
+
+    with Timer() as t:
+        swaps = SwapCounter(topology)
+        if routing_option == 'lookahead' and trials > 1: # best of seeded trials on trial_workers processes
+            with profiler.span("trials"):
+                isa = run_trials(
+                    qc, topology, trials, trial_workers, mapping_options=mapping_options, initial_map=best_layout,
+                    layout_cache=layout_cache, interactions=interactions, profiler=profiler,
+                )["circuit"]
+        else:
+            with profiler.span("transpile"):
+                pm = build_pass_manager(routing_option, backend, best_layout, topology, profiler, mapping_options, layout_cache, interactions)
+                isa = pm.run(qc, callback=swaps)
+    if routing_option == 'lookahead' and trials > 1:
+        swaps.update(circuit_to_dag(isa))
+
+    layout_result = dict_benchmark[str(circuit_size)][benchmark_name].setdefault(layout_key(layout_name, num_qubits, num_group), {})
+    layout_result[f'{routing_option}_size'] = isa.size()
+    layout_result[f'{routing_option}_depth'] = isa.depth()
+
+    layout_result[f'{routing_option}_swap'] = 3 * swaps.swap # same unit as the former size-difference estimate
+    layout_result[f'{routing_option}_swap_gates'] = swaps.swap # SWAP gates inserted by the routing
+    layout_result[f'{routing_option}_interval'] = t.interval
+    layout_result[f'{routing_option}_remote_swap'] = swaps.remote_swap
+    layout_result[f'{routing_option}_remote_ops'] = count_remote_operations(isa, topology)
+    if profile:
+        layout_result[f'{routing_option}_profile'] = profiler.report()
+    if validate: # outside the timer, isa carries the initial and final layout of the transpilation
+        validation = validate_routing(qc, isa, coupling_map=topology.coupling_map)
+        layout_result[f'{routing_option}_equivalent'] = validation["equivalent"] and validation["connected"]
+        layout_result[f'{routing_option}_validation'] = validation["method"]
+    return layout_result
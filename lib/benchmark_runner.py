@@ -0,0 +1,188 @@
+import argparse
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from lib.benchmark_helper import RESULT_FILE, layout_key, open_json_from_file, start_initial_benchmark, update_dict_size_depth
+from lib.circuit_cache import CIRCUIT_CACHE_DIR, CircuitCache
+from lib.distributed_coupling_map import REMOTE_LINK_WEIGHT
+from lib.layout_cache import LayoutCache
+from lib.result_store import RESULT_STORE_FILE, ResultStore
+
+"""
+Parallel, resumable version of the benchmark loop in 5_benchmarking.ipynb.
+
+Every (circuit_size, benchmark) pair is a task on a process pool that generates (or loads) the circuit
+once and runs its pending (layout, routing) cells one after another. Each finished cell is appended to the
+result store (lib/result_store.py) and cells that are already in the store are skipped, so an interrupted
+sweep continues where it stopped:
+
+    python -m lib.benchmark_runner --sizes 5 10 15 --workers 8 --timeout 600
+"""
+
+BENCHMARK_NAMES = [
+    "dj", "ghz", "graphstate", "portfolioqaoa", "portfoliovqe", "qaoa", "qft", "qftentangled",
+    "qnn", "random", "realamprandom", "su2random", "twolocalrandom", "vqe", "wstate",
+]
+
+# number of qubits between 18 (grid) - 20 qubits
+DISTRIBUTED_OPTIONS = [
+    ['full', 20, 1], # monolithic
+    ['line', 20, 1], # monolithic
+    ['full', 10, 2], # distributed
+    ['full', 7, 3],
+    ['grid', 9, 2],
+    ['grid', 8, 3],
+    ['ring', 10, 2],
+    ['ring', 7, 3],
+    ['t_horizontal', 5, 4],
+    ['t_vertical', 5, 4],
+]
+
+ROUTING_OPTIONS = ['basic', 'sabre', 'lookahead']
+
+class TaskTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout()
+
+@lru_cache(maxsize=8)
+def _initial_benchmark(benchmark_name: str, circuit_size: int, cache_dir: str | None):
+    # a task generates (or loads) its circuit once and reuses it for all of its cells
+    dict_init = {}
+    cache = CircuitCache(cache_dir) if cache_dir else None
+    qc, interactions = start_initial_benchmark(benchmark_name, circuit_size, dict_init, cache=cache)
+    return qc, interactions, dict_init[str(circuit_size)][benchmark_name]['init']
+
+@lru_cache(maxsize=2)
+def _layout_cache(layout_cache_dir: str) -> LayoutCache:
+    # one cache per worker, the directory shares the layouts between workers and runs
+    return LayoutCache(directory=layout_cache_dir)
+
+def run_cell(circuit_size, benchmark_name, layout_name, num_qubits, num_group, routing_option, timeout=None, mapping_options=None, cache_dir=CIRCUIT_CACHE_DIR, remote_weight=REMOTE_LINK_WEIGHT, profile=False, layout_cache_dir=None, validate=False, trials=1):
+    # worker: returns (cell, init result, layout result or None, error message or None)
+    cell = (circuit_size, benchmark_name, layout_name, num_qubits, num_group, routing_option)
+    if timeout:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        qc, interactions, init = _initial_benchmark(benchmark_name, circuit_size, cache_dir)
+        dict_cell = {str(circuit_size): {benchmark_name: {}}}
+        result = update_dict_size_depth(
+            qc, None, layout_name, num_qubits, num_group, routing_option, dict_cell,
+            circuit_size=circuit_size, benchmark_name=benchmark_name, mapping_options=mapping_options, remote_weight=remote_weight,
+            profile=profile, layout_cache=_layout_cache(layout_cache_dir) if layout_cache_dir else None, validate=validate,
+            trials=trials, trial_workers=1, interactions=interactions, # the cells already fill the pool
+        )
+        return cell, init, result, None
+    except TaskTimeout:
+        return cell, None, None, f"timeout after {timeout}s"
+    except Exception as error:
+        return cell, None, None, str(error)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def build_record(circuit_size, benchmark_name, layout_name, num_qubits, num_group, routing_option, init, result) -> dict:
+    # flat store record: the cell key, the metrics without the routing prefix and the initial circuit as init_*
+    record = {
+        "circuit_size": circuit_size, "benchmark": benchmark_name,
+        "layout": layout_key(layout_name, num_qubits, num_group), "routing": routing_option,
+    }
+    record.update({key.removeprefix(f"{routing_option}_"): value for key, value in result.items()})
+    record.update({f"init_{key}": value for key, value in init.items()})
+    return record
+
+def run_task(circuit_size, benchmark_name, cells, filename=RESULT_STORE_FILE, timeout=None, **options):
+    # worker: the (layout_name, num_qubits, num_group, routing_option) cells of one circuit, every finished
+    # cell is appended to the store right away; returns the failed cells with their error message
+    store = ResultStore(filename)
+    failed = []
+    for layout_cell in cells:
+        cell, init, result, error = run_cell(circuit_size, benchmark_name, *layout_cell, timeout=timeout, **options)
+        print(*cell, error or "done", file=sys.stderr)
+        if error is not None:
+            failed.append((*cell, error))
+            continue
+        store.append(build_record(*cell, init, result))
+    return failed
+
+def pending_tasks(completed, circuit_size_list, benchmark_name_list, distributed_options, routing_options):
+    # (circuit_size, benchmark_name, pending cells) for every circuit with at least one cell to run
+    tasks = []
+    for circuit_size in circuit_size_list:
+        for benchmark_name in benchmark_name_list:
+            cells = [
+                (layout_name, num_qubits, num_group, routing_option)
+                for layout_name, num_qubits, num_group in distributed_options
+                for routing_option in routing_options
+                if (circuit_size, benchmark_name, layout_key(layout_name, num_qubits, num_group), routing_option) not in completed
+            ]
+            if cells:
+                tasks.append((circuit_size, benchmark_name, cells))
+    # largest circuits first so the slowest tasks do not end up alone at the tail of the run
+    tasks.sort(key=lambda task: -task[0])
+    return tasks
+
+def run_benchmarks(
+    circuit_size_list, benchmark_name_list, distributed_options=DISTRIBUTED_OPTIONS, routing_options=ROUTING_OPTIONS,
+    filename=RESULT_STORE_FILE, workers=None, timeout=None, mapping_options=None, cache_dir=CIRCUIT_CACHE_DIR,
+    remote_weight=REMOTE_LINK_WEIGHT, profile=False, layout_cache_dir=None, validate=False, trials=1,
+):
+    store = ResultStore(filename)
+    tasks = pending_tasks(store.completed_keys(), circuit_size_list, benchmark_name_list, distributed_options, routing_options)
+    print(f"{sum(len(cells) for _, _, cells in tasks)} cells in {len(tasks)} tasks to run", file=sys.stderr)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_task, *task, filename=filename, timeout=timeout, mapping_options=mapping_options, cache_dir=cache_dir, remote_weight=remote_weight, profile=profile, layout_cache_dir=layout_cache_dir, validate=validate, trials=trials) for task in tasks]
+        for future in as_completed(futures):
+            failed.extend(future.result())
+    return store, failed
+
+def parse_layout(option: str):
+    # "ring_7_3" -> ['ring', 7, 3], "t_horizontal_5_4" -> ['t_horizontal', 5, 4]
+    layout_name, num_qubits, num_group = option.rsplit("_", 2)
+    return [layout_name, int(num_qubits), int(num_group)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the routing benchmark sweep on a process pool.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 15])
+    parser.add_argument("--benchmarks", nargs="+", default=BENCHMARK_NAMES)
+    parser.add_argument("--layouts", type=parse_layout, nargs="+", default=DISTRIBUTED_OPTIONS, help="e.g. ring_7_3 grid_8_3")
+    parser.add_argument("--routings", nargs="+", default=ROUTING_OPTIONS, choices=ROUTING_OPTIONS)
+    parser.add_argument("--output", default=RESULT_STORE_FILE)
+    parser.add_argument("--import-json", nargs="?", const=RESULT_FILE, default=None, help=f"first add the cells of a nested JSON result file (default {RESULT_FILE}) to the store, they are then skipped")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per cell")
+    parser.add_argument("--circuit-cache", default=CIRCUIT_CACHE_DIR, help="directory of generated circuits, empty string to disable")
+    parser.add_argument("--remote-weight", type=float, default=REMOTE_LINK_WEIGHT, help="cost of an inter-group link relative to an on-chip coupler")
+    parser.add_argument("--layout-cache", default=None, help="directory of memoized InteractionMapping layouts, the lookahead interval then excludes the mapping of cached circuits")
+    parser.add_argument("--trials", type=int, default=1, help="seeded lookahead trials per cell, the one with the fewest swaps is kept")
+    parser.add_argument("--validate", action="store_true", help="check every routed circuit against its original (lib/routing_validation.py)")
+    parser.add_argument("--profile", action="store_true", help="record spans and counters of every cell")
+    parser.add_argument("--beam-width", type=int, default=None, help="InteractionMapping beam width")
+    parser.add_argument("--deadline", type=float, default=None, help="InteractionMapping deadline in seconds")
+    parser.add_argument("--hierarchical", action="store_true", help="partition-first mapping (lib/hierarchical_mapping.py)")
+    args = parser.parse_args(argv)
+
+    if args.import_json:
+        imported = ResultStore(args.output).import_nested_dict(open_json_from_file(args.import_json))
+        print(f"{imported} cells imported from {args.import_json}", file=sys.stderr)
+    mapping_options = {"beam_width": args.beam_width, "deadline": args.deadline}
+    if args.hierarchical: # groups placed one after another, the cells already fill the pool
+        mapping_options.update(hierarchical=True, workers=1)
+    _, failed = run_benchmarks(
+        args.sizes, args.benchmarks, args.layouts, args.routings,
+        filename=args.output, workers=args.workers, timeout=args.timeout, mapping_options=mapping_options,
+        cache_dir=args.circuit_cache or None, remote_weight=args.remote_weight, profile=args.profile,
+        layout_cache_dir=args.layout_cache, validate=args.validate, trials=args.trials,
+    )
+    for cell in failed:
+        print("ERROR:", *cell, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import numpy as np
+import qiskit
+from qiskit import QuantumCircuit, qpy
+
+from lib.file_cache import load_entry, trim_directory, write_atomic
+
+"""
+Content-addressed on-disk cache of generated benchmark circuits.
+
+An entry is keyed by the generation settings (benchmark name, level, circuit size, compiler settings) and the
+installed mqt.bench and qiskit versions, so an upgraded generator does not keep serving old circuits. It
+stores the circuit as QPY next to its two-qubit interaction pairs (.npz). Entries are evicted least
+recently used first once the cache directory grows over max_bytes (lib/file_cache.py).
+"""
+
+CIRCUIT_CACHE_DIR = "result/circuit_cache"
+
+class CircuitCache:
+    def __init__(self, directory: str = CIRCUIT_CACHE_DIR, max_bytes: int = 512 * 1024**2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def generator_versions() -> dict:
+        try:
+            mqt_bench = importlib.metadata.version("mqt.bench")
+        except importlib.metadata.PackageNotFoundError:
+            mqt_bench = None
+        return {"mqt.bench": mqt_bench, "qiskit": qiskit.__version__}
+
+    @staticmethod
+    def key(benchmark_name: str, level: str, circuit_size: int, compiler_settings: dict) -> str:
+        versions = CircuitCache.generator_versions()
+        settings = json.dumps([benchmark_name, level, circuit_size, compiler_settings, versions], sort_keys=True, default=str)
+        return hashlib.sha256(settings.encode()).hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key: str) -> tuple[QuantumCircuit, np.ndarray] | None:
+        circuit_path, interaction_path = self._path(key, "qpy"), self._path(key, "npz")
+
+        def load():
+            with open(circuit_path, "rb") as circuit_file:
+                qc = qpy.load(circuit_file)[0]
+            with np.load(interaction_path) as data:
+                return qc, data["interactions"]
+        return load_entry([circuit_path, interaction_path], load)
+
+    def put(self, key: str, qc: QuantumCircuit, interactions: np.ndarray):
+        write_atomic(self._path(key, "npz"), lambda f: np.savez(f, interactions=interactions), binary=True)
+        write_atomic(self._path(key, "qpy"), lambda f: qpy.dump(qc, f), binary=True)
+        self.evict()
+
+    def evict(self):
+        trim_directory(self.directory, (".qpy", ".npz"), self.max_bytes)
+
+    def get_or_create(self, key: str, generate, interactions_of) -> tuple[QuantumCircuit, np.ndarray]:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        qc = generate()
+        interactions = interactions_of(qc)
+        self.put(key, qc, interactions)
+        return qc, interactions
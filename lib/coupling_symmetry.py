@@ -0,0 +1,85 @@
+import math
+import numpy as np
+import rustworkx as rx
+from qiskit.transpiler import CouplingMap
+
+"""
+Automorphisms of a coupling map, used to keep one representative of equivalent partial mappings.
+
+Interchangeable physical qubits (twins: same neighbourhood, e.g. the inner qubits of a fully connected
+group) are handled by sorting, the remaining symmetry (e.g. mirroring a chain of identical groups) is
+enumerated with VF2 on the graph where every twin class is collapsed into one node.
+"""
+
+class CouplingSymmetry:
+    def __init__(self, num_qubits: int, twin_classes: list[list[int]], permutations: list[np.ndarray]):
+        self.num_qubits = num_qubits
+        self.twin_classes = [sorted(members) for members in twin_classes]
+        self.class_id = np.empty(num_qubits, dtype=np.int64)
+        for idx, members in enumerate(self.twin_classes):
+            self.class_id[members] = idx
+        self.class_members = np.array([q for members in self.twin_classes for q in members], dtype=np.int64)
+        self.class_start = np.cumsum([0] + [len(members) for members in self.twin_classes[:-1]])
+        # physical permutations between twin classes, the identity is always the first entry
+        self.permutations = permutations
+
+    @classmethod
+    def from_coupling_map(cls, coupling_map: CouplingMap, max_automorphisms: int = 256):
+        num_qubits = coupling_map.size()
+        neighbors = [frozenset(coupling_map.neighbors(q)) | frozenset(coupling_map.graph.predecessor_indices(q)) for q in range(num_qubits)]
+
+        # closed twins are adjacent to each other (full groups), open twins are not (e.g. leaves of a star)
+        closed, open_ = {}, {}
+        for q in range(num_qubits):
+            closed.setdefault(neighbors[q] | {q}, []).append(q)
+        twin_classes = [members for members in closed.values() if len(members) > 1]
+        for q in range(num_qubits):
+            if len(closed[neighbors[q] | {q}]) == 1:
+                open_.setdefault(neighbors[q], []).append(q)
+        twin_classes += list(open_.values())
+        twin_classes.sort(key=min)
+
+        class_of = {q: idx for idx, members in enumerate(twin_classes) for q in members}
+        quotient = rx.PyGraph()
+        quotient.add_nodes_from([(len(members), len(members) > 1 and members[1] in neighbors[members[0]]) for members in twin_classes])
+        quotient.add_edges_from_no_data(sorted({
+            tuple(sorted((class_of[q0], class_of[q1])))
+            for q0, q1 in coupling_map.get_edges() if class_of[q0] != class_of[q1]
+        }))
+
+        permutations = []
+        for mapping in rx.vf2_mapping(quotient, quotient, node_matcher=lambda a, b: a == b, subgraph=False, id_order=True):
+            permutation = np.empty(num_qubits, dtype=np.int64)
+            for source, target in mapping.items():
+                permutation[sorted(twin_classes[source])] = sorted(twin_classes[target])
+            permutations.append(permutation)
+            if len(permutations) >= max_automorphisms:
+                break
+        identity = np.arange(num_qubits)
+        permutations = [identity] + [p for p in permutations if not np.array_equal(p, identity)]
+        return cls(num_qubits, twin_classes, permutations)
+
+    def size(self) -> int:
+        # number of automorphisms represented (twin swaps times the enumerated class permutations)
+        total = len(self.permutations)
+        for members in self.twin_classes:
+            total *= math.factorial(len(members))
+        return total
+
+    def canonical_key(self, logicals: np.ndarray, physicals: np.ndarray) -> tuple:
+        # smallest image of the partial mapping, physical qubits listed in ascending logical order
+        order = np.argsort(logicals, kind="stable")
+        logicals = logicals[order]
+        best = None
+        for permutation in self.permutations:
+            image = permutation[physicals[order]]
+            classes = self.class_id[image]
+            by_class = np.lexsort((logicals, classes))  # inside one class the logical qubits take the members in order
+            sorted_classes = classes[by_class]
+            first = np.searchsorted(sorted_classes, sorted_classes, side="left")
+            canonical = np.empty_like(image)
+            canonical[by_class] = self.class_members[self.class_start[sorted_classes] + np.arange(len(by_class)) - first]
+            key = tuple(canonical.tolist())
+            if best is None or key < best:
+                best = key
+        return best
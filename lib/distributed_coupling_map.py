@@ -1,98 +1,200 @@
+import math
+from functools import cached_property, lru_cache
+import numpy as np
+import rustworkx as rx
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
 from qiskit.transpiler import CouplingMap
-from qiskit_ibm_runtime.fake_provider import FakeLondonV2
+from qiskit.providers.fake_provider import GenericBackendV2
 
 """
 From documentation: https://docs.quantum.ibm.com/api/qiskit/qiskit.transpiler.CouplingMap
+
+The build_coupling_list_* functions return plain edge lists, which 5_benchmarking.ipynb passes to
+GenericBackendV2, so they carry no link costs. DistributedTopology is the only source of the costs of
+inter-group links (edge_weights per edge, cost_matrix for the distances): the mapping, the routing and the
+layout cache read them from there, never from the edge lists.
 """
 
+# cost of a link between two groups relative to an on-chip coupler
+REMOTE_LINK_WEIGHT = 10.0
+
+# coupling map of FakeLondonV2 (T shape: 0 - 1 - 3 - 4 with 2 below 1), kept here so a T layout does not load the fake backend
+T_SHAPE_EDGES = [(0, 1), (1, 0), (1, 2), (1, 3), (2, 1), (3, 1), (3, 4), (4, 3)]
+
+def tile_group_edges(group_edges, group_size: int, num_group: int, link_back: int = 1) -> np.ndarray:
+    # (num_edges, 2) array: the group edges shifted once per group, then the links from the first qubit
+    # of every group to the qubit `link_back` positions before it (same order as the former loops)
+    group_edges = np.asarray(group_edges, dtype=np.int64).reshape(-1, 2)
+    offsets = np.arange(num_group, dtype=np.int64) * group_size
+    intra = (group_edges[np.newaxis, :, :] + offsets[:, np.newaxis, np.newaxis]).reshape(-1, 2)
+    starts = offsets[1:]
+    links = np.stack([starts, starts - link_back, starts - link_back, starts], axis=1).reshape(-1, 2)
+    return np.concatenate([intra, links])
+
+def _edge_list(edges: np.ndarray) -> list[tuple]:
+    return list(map(tuple, edges.tolist()))
+
 # coupling list ring: Return a coupling map of n qubits connected to each of their neighbors in a ring.
 def build_coupling_list_ring(num_qubits: int, num_group: int):
-    coupling_list = []
-    for i in range(num_group):
-        cm = CouplingMap.from_ring(num_qubits, bidirectional=True)
-        edges = [
-            (i * num_qubits + node1, i * num_qubits + node2)
-            for node1, node2 in cm.get_edges()
-        ]
-        coupling_list.extend(edges)
-
-    for i in range(1, num_group):
-        coupling_list.append((i * num_qubits, i * num_qubits - 1))
-        coupling_list.append((i * num_qubits - 1, i * num_qubits))
-    return coupling_list
+    return _edge_list(tile_group_edges(CouplingMap.from_ring(num_qubits, bidirectional=True).get_edges(), num_qubits, num_group))
 
 # coupling list full: Return a fully connected coupling map on n qubits.
 def build_coupling_list_full(num_qubits: int, num_group: int):
-    coupling_list = []
-    for i in range(num_group):
-        cm = CouplingMap.from_full(num_qubits, bidirectional=True)
-        edges = [
-            (i * num_qubits + node1, i * num_qubits + node2)
-            for node1, node2 in cm.get_edges()
-        ]
-        coupling_list.extend(edges)
-
-    for i in range(1, num_group):
-        coupling_list.append((i * num_qubits, i * num_qubits - 1))
-        coupling_list.append((i * num_qubits - 1, i * num_qubits))
-    return coupling_list
+    return _edge_list(tile_group_edges(CouplingMap.from_full(num_qubits, bidirectional=True).get_edges(), num_qubits, num_group))
 
 # coupling list line: Return a coupling map of n qubits connected in a line.
 def build_coupling_list_line(num_qubits: int, num_group: int):
-    cm = CouplingMap.from_line(num_qubits=num_qubits * num_group, bidirectional=True)
-    return cm.get_edges()
+    return _edge_list(line_edges(num_qubits * num_group))
+
+def line_edges(num_qubits: int) -> np.ndarray:
+    # same order as CouplingMap.from_line: (0, 1), (1, 0), (1, 2), (2, 1), ...
+    left = np.arange(num_qubits - 1, dtype=np.int64)
+    return np.stack([left, left + 1, left + 1, left], axis=1).reshape(-1, 2)
 
 # coupling list grid: Return a coupling map of qubits connected on a grid of num_rows x num_columns.
 def build_coupling_list_grid(num_rows: int, num_columns: int, num_group: int):
-    coupling_list = []
-    multiplier = num_rows * num_columns
-    for i in range(num_group):
-        cm = CouplingMap.from_grid(num_rows, num_columns, bidirectional=True)
-        edges = [
-            (i * multiplier + node1, i * multiplier + node2)
-            for node1, node2 in cm.get_edges()
-        ]
-        coupling_list.extend(edges)
-
-    for i in range(1, num_group):
-        coupling_list.append((i * multiplier, i * multiplier - 1))
-        coupling_list.append((i * multiplier - 1, i * multiplier))
-    return coupling_list
+    group_edges = CouplingMap.from_grid(num_rows, num_columns, bidirectional=True).get_edges()
+    return _edge_list(tile_group_edges(group_edges, num_rows * num_columns, num_group))
 
 # coupling list t_horizontal: Return a coupling map of 5 T-shaped qubits connected on longer end.
 def build_coupling_list_t_horizontal(
     num_group: int,
 ):  # num qubits = 5, horizontal connect with 4
-    coupling_list = []
-    fake_london = FakeLondonV2()
-    cm = fake_london.coupling_map
-    num_qubits = fake_london.num_qubits
-    for i in range(num_group):
-        edges = [
-            (i * num_qubits + node1, i * num_qubits + node2)
-            for node1, node2 in cm.get_edges()
-        ]
-        coupling_list.extend(edges)
-
-    for i in range(1, num_group):
-        coupling_list.append((i * num_qubits, i * num_qubits - 1))
-        coupling_list.append((i * num_qubits - 1, i * num_qubits))
-    return coupling_list
+    return _edge_list(tile_group_edges(T_SHAPE_EDGES, 5, num_group))
 
 # coupling list t_vertical: Return a coupling map of 5 T-shaped qubits connected on shorter end.
 def build_coupling_list_t_vertical(num_group: int):
-    coupling_list = []
-    fake_london = FakeLondonV2()
-    cm = fake_london.coupling_map
-    num_qubits = fake_london.num_qubits
-    for i in range(num_group):
-        edges = [
-            (i * num_qubits + node1, i * num_qubits + node2)
-            for node1, node2 in cm.get_edges()
-        ]
-        coupling_list.extend(edges)
-
-    for i in range(1, num_group):
-        coupling_list.append((i * num_qubits, i * num_qubits - 3))
-        coupling_list.append((i * num_qubits - 3, i * num_qubits))
-    return coupling_list
\ No newline at end of file
+    return _edge_list(tile_group_edges(T_SHAPE_EDGES, 5, num_group, link_back=3))
+
+@lru_cache(maxsize=32)
+def _group_structure(layout_name: str, num_qubits: int):
+    # (edges of one group, qubits per group, link_back) of a layout
+    if layout_name == "full":
+        return np.array(CouplingMap.from_full(num_qubits, bidirectional=True).get_edges()), num_qubits, 1
+    if layout_name == "ring":
+        return np.array(CouplingMap.from_ring(num_qubits, bidirectional=True).get_edges()), num_qubits, 1
+    if layout_name == "grid":
+        num_rows = math.ceil(math.sqrt(num_qubits))
+        num_columns = math.floor(math.sqrt(num_qubits))
+        return np.array(CouplingMap.from_grid(num_rows, num_columns, bidirectional=True).get_edges()), num_rows * num_columns, 1
+    if layout_name == "t_horizontal":
+        return np.array(T_SHAPE_EDGES), 5, 1
+    if layout_name == "t_vertical":
+        return np.array(T_SHAPE_EDGES), 5, 3
+    raise Exception(f"Layout name: {layout_name} is not supported yet.")
+
+
+class DistributedTopology:
+    """
+    num_group copies of one coupling graph joined by single inter-group links. The edges are built once as
+    a NumPy array; the backend, CouplingMap, distance matrix and neighbour arrays are computed on first use
+    and then shared by the layout, mapping and routing code that gets this instance.
+
+    On-chip couplers cost 1 and inter-group links cost remote_weight: the mapper scales the QBN of a
+    neighbour behind a remote link by 1 / remote_weight and the router scores swaps with cost_matrix.
+    """
+
+    def __init__(self, layout_name: str, num_qubits: int, num_group: int, remote_weight: float = REMOTE_LINK_WEIGHT):
+        self.layout_name = layout_name
+        self.num_qubits = num_qubits  # requested qubits per group, the grid rounds it to rows x columns
+        self.num_group = num_group
+        self.remote_weight = remote_weight
+        if layout_name == "line":
+            self.group_size = num_qubits
+            edges = line_edges(num_qubits * num_group)
+        else:
+            group_edges, self.group_size, link_back = _group_structure(layout_name, num_qubits)
+            edges = tile_group_edges(group_edges, self.group_size, num_group, link_back)
+        edges.setflags(write=False)
+        self.edges = edges  # (num_edges, 2) directed edges, both directions listed
+        self.size = self.group_size * num_group
+        self.group_of = np.repeat(np.arange(num_group, dtype=np.int64), self.group_size)  # group index per physical qubit
+        self.inter_group_links = np.flatnonzero(self.group_of[edges[:, 0]] != self.group_of[edges[:, 1]])  # rows of self.edges
+        self.edge_weights = np.ones(len(edges))  # cost of every row of self.edges
+        self.edge_weights[self.inter_group_links] = remote_weight
+        self.edge_weights.setflags(write=False)
+
+    def __reduce__(self):
+        # pickled by its arguments, a worker process rebuilds it through the shared distributed_topology() cache
+        return distributed_topology, (self.layout_name, self.num_qubits, self.num_group, self.remote_weight)
+
+    def coupling_list(self) -> list[tuple]:
+        return _edge_list(self.edges)
+
+    def group_qubits(self, group: int) -> range:
+        return range(group * self.group_size, (group + 1) * self.group_size)
+
+    def is_remote(self, physical0, physical1):
+        # True for a pair of physical qubits in different groups, works element-wise on arrays
+        return self.group_of[physical0] != self.group_of[physical1]
+
+    @cached_property
+    def coupling_map(self) -> CouplingMap:
+        return CouplingMap(self.coupling_list())
+
+    @cached_property
+    def backend(self) -> GenericBackendV2:
+        return GenericBackendV2(num_qubits=self.size, coupling_map=self.coupling_list())
+
+    @cached_property
+    def graph(self) -> rx.PyGraph:
+        # undirected graph, one edge per coupled pair
+        graph = rx.PyGraph()
+        graph.add_nodes_from(range(self.size))
+        graph.add_edges_from_no_data(_edge_list(self.undirected_edges))
+        return graph
+
+    @cached_property
+    def undirected_edges(self) -> np.ndarray:
+        pairs = np.unique(np.sort(self.edges, axis=1), axis=0)
+        pairs.setflags(write=False)
+        return pairs
+
+    @cached_property
+    def distance_matrix(self) -> np.ndarray:
+        distance = rx.graph_distance_matrix(self.graph).astype(np.int64)
+        distance.setflags(write=False)
+        return distance
+
+    @cached_property
+    def cost_matrix(self) -> np.ndarray:
+        # all-pairs shortest path cost with the link weights, equal to distance_matrix without remote links;
+        # Dijkstra from every qubit, the graph is sparse with positive weights (Floyd-Warshall is O(V^3))
+        pairs = self.undirected_edges
+        weights = np.where(self.is_remote(pairs[:, 0], pairs[:, 1]), self.remote_weight, 1.0)
+        graph = csr_matrix((weights, (pairs[:, 0], pairs[:, 1])), shape=(self.size, self.size))
+        cost = shortest_path(graph, method="D", directed=False)
+        cost.setflags(write=False)
+        return cost
+
+    @cached_property
+    def neighbor_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        # CSR layout: neighbours of physical qubit Q are neighbor_idx[neighbor_ptr[Q]:neighbor_ptr[Q + 1]], sorted
+        both = np.concatenate([self.undirected_edges, self.undirected_edges[:, ::-1]])
+        both = both[np.lexsort((both[:, 1], both[:, 0]))]
+        neighbor_ptr = np.zeros(self.size + 1, dtype=np.int64)
+        neighbor_ptr[1:] = np.cumsum(np.bincount(both[:, 0], minlength=self.size))
+        neighbor_idx = np.ascontiguousarray(both[:, 1])
+        return neighbor_ptr, neighbor_idx
+
+    @cached_property
+    def neighbor_costs(self) -> np.ndarray:
+        # link cost of every entry of neighbor_idx
+        neighbor_ptr, neighbor_idx = self.neighbor_arrays
+        qubits = np.repeat(np.arange(self.size), np.diff(neighbor_ptr))
+        costs = np.where(self.is_remote(qubits, neighbor_idx), self.remote_weight, 1.0)
+        costs.setflags(write=False)
+        return costs
+
+    @cached_property
+    def neighbor_lists(self) -> tuple[tuple[int, ...], ...]:
+        neighbor_ptr, neighbor_idx = self.neighbor_arrays
+        return tuple(
+            tuple(neighbor_idx[neighbor_ptr[qubit] : neighbor_ptr[qubit + 1]].tolist()) for qubit in range(self.size)
+        )
+
+@lru_cache(maxsize=32)
+def distributed_topology(layout_name: str, num_qubits: int, num_group: int, remote_weight: float = REMOTE_LINK_WEIGHT) -> DistributedTopology:
+    # one shared instance per layout, so repeated benchmarks reuse the backend and the precomputed arrays
+    return DistributedTopology(layout_name, num_qubits, num_group, remote_weight)
@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+"""
+File handling shared by the on-disk caches (lib/circuit_cache.py, lib/layout_cache.py).
+
+An entry is one or more files named <key><extension> in the cache directory. Several worker processes
+read, write and evict the same directory, so a write goes through a temporary file and os.replace, and an
+entry that disappears between two file operations counts as missing instead of raising. The modification
+time of the files marks when the entry was last used; trim_directory() removes the least recently used
+entries until the directory fits in max_bytes.
+"""
+
+def write_atomic(path: str, dump, binary: bool = False):
+    # write to a temporary file first, a reader never sees a half written entry
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w") as tmp_file:
+            dump(tmp_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def load_entry(paths: list[str], load):
+    # load() of an entry, then mark its files as recently used; None if it cannot be read, also when
+    # another process evicted it in between
+    try:
+        value = load()
+        for path in paths:
+            os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return value
+
+def trim_directory(directory: str, extensions: tuple[str, ...], max_bytes: int):
+    # the files of one key form one entry, used as recently as its newest file
+    entries = {}
+    for filename in os.listdir(directory):
+        key, extension = os.path.splitext(filename)
+        if extension in extensions:
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except FileNotFoundError:  # removed by another process since listdir
+                continue
+            size, used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+    total = sum(size for size, _ in entries.values())
+    for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= max_bytes:
+            break
+        for extension in extensions:
+            try:
+                os.remove(os.path.join(directory, key + extension))
+            except FileNotFoundError:
+                pass
+        total -= size
@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import rustworkx as rx
+from qiskit import QuantumRegister
+from qiskit.dagcircuit import DAGCircuit
+from qiskit.transpiler import CouplingMap
+
+from lib.distributed_coupling_map import DistributedTopology, distributed_topology
+from lib.interaction_mapping import InteractionMapping, two_qubit_interactions
+from lib.timer_helper import NULL_PROFILER, Profiler
+
+"""
+Partition-first mapping for topologies with many groups.
+
+The QPI interaction graph of the circuit is cut into balanced parts, as many as the circuit needs groups
+(at most num_group), so a small circuit is not spread over more groups than necessary. Parts are grown
+greedily around the most interacting logical qubits, then improved with Kernighan-Lin swaps (exchange the
+pair of logical qubits in two parts that lowers the QPI weight between parts the most) until no swap helps.
+Strongly connected parts go to neighbouring groups, and every part is placed inside its group with
+InteractionMapping on the coupling graph of a single group, on a process pool. The search therefore grows
+with the group size instead of the total number of physical qubits, and the cross-group QPI is minimized
+directly instead of as a side effect of the placement order.
+"""
+
+def _part_sizes(num_logical: int, num_parts: int) -> np.ndarray:
+    return np.array([num_logical // num_parts + (part < num_logical % num_parts) for part in range(num_parts)], dtype=np.int64)
+
+def grow_partition(weights: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # part of every logical qubit: each part starts from the unassigned qubit with the highest total weight
+    # and takes the unassigned qubit most connected to it until it has its size
+    num_logical = len(weights)
+    part = np.full(num_logical, -1, dtype=np.int64)
+    total = weights.sum(axis=1)
+    for index, size in enumerate(sizes.tolist()):
+        connection = np.zeros(num_logical)
+        for _ in range(size):
+            free = part < 0
+            # most connected first, total weight breaks ties (and picks the seed of the part)
+            score = np.where(free, connection * (total.max() + 1) + total, -np.inf)
+            qubit = int(np.argmax(score))
+            part[qubit] = index
+            connection += weights[qubit]
+    return part
+
+def refine_partition(weights: np.ndarray, part: np.ndarray, num_parts: int, max_swaps: int | None = None) -> tuple[np.ndarray, int]:
+    """Kernighan-Lin refinement: apply the swap of two logical qubits in different parts with the highest
+    positive gain (drop of the weight between parts) until there is none. Part sizes do not change."""
+    part = part.copy()
+    num_logical = len(weights)
+    connection = np.zeros((num_logical, num_parts))  # weight from every qubit into every part
+    np.add.at(connection.T, part, weights)
+    max_swaps = num_logical if max_swaps is None else max_swaps
+    swaps = 0
+    while swaps < max_swaps:
+        internal = connection[np.arange(num_logical), part]
+        towards = connection[:, part]  # towards[u, v] = weight from u into the part of v
+        gain = towards - internal[:, None] + towards.T - internal[None, :] - 2 * weights
+        gain[part[:, None] == part[None, :]] = -np.inf
+        qubit0, qubit1 = np.unravel_index(int(np.argmax(gain)), gain.shape)
+        if gain[qubit0, qubit1] <= 1e-9:
+            break
+        part0, part1 = part[qubit0], part[qubit1]
+        connection[:, part0] += weights[:, qubit1] - weights[:, qubit0]
+        connection[:, part1] += weights[:, qubit0] - weights[:, qubit1]
+        part[qubit0], part[qubit1] = part1, part0
+        swaps += 1
+    return part, swaps
+
+def group_order(topology: DistributedTopology) -> list[int]:
+    # groups in breadth-first order over the inter-group links, 0, 1, 2, ... for the chained layouts
+    graph = rx.PyGraph()
+    graph.add_nodes_from(range(topology.num_group))
+    links = topology.edges[topology.inter_group_links]
+    graph.add_edges_from_no_data(list({(int(topology.group_of[p0]), int(topology.group_of[p1])) for p0, p1 in links.tolist()}))
+    order = []
+    for component in sorted(rx.connected_components(graph), key=min):
+        order.extend(node for layer in rx.bfs_layers(graph, [min(component)]) for node in sorted(layer))
+    return list(dict.fromkeys(order))
+
+def part_order(part_weights: np.ndarray) -> list[int]:
+    # linear order of the parts: start with the least connected one, then always the part that interacts
+    # most with the previous one, so parts that talk to each other end up in neighbouring groups
+    np.fill_diagonal(part_weights, 0)
+    remaining = set(range(len(part_weights)))
+    current = min(remaining, key=lambda index: (part_weights[index].sum(), index))
+    order = [current]
+    remaining.remove(current)
+    while remaining:
+        current = max(sorted(remaining), key=lambda index: part_weights[current, index])
+        order.append(current)
+        remaining.remove(current)
+    return order
+
+def place_group(group_topology: DistributedTopology, interactions: np.ndarray, num_logical: int, mapping_options: dict) -> tuple[list[tuple], bool]:
+    # InteractionMapping of one part on a single group, logical and physical indices local to the part / group
+    dag = DAGCircuit()
+    dag.add_qreg(QuantumRegister(num_logical, "q"))
+    mapping = InteractionMapping(group_topology, dag, interactions=interactions, **mapping_options)
+    return mapping.get_best_qpi_layout(), mapping.deadline_reached
+
+class HierarchicalMapping:
+    """Same interface as InteractionMapping (get_best_qpi_layout(), maps, qpi_rank, deadline_reached).
+
+    workers > 1 places the groups on that many processes (None = one per CPU), workers=1 places them one
+    after another; the remaining keyword arguments go to the InteractionMapping of every group.
+    """
+    def __init__(
+        self,
+        coupling_map: DistributedTopology,
+        dag: DAGCircuit,
+        workers: int | None = None,
+        profiler: Profiler = NULL_PROFILER,
+        interactions: np.ndarray | None = None,
+        **mapping_options,
+    ):
+        self.topology = coupling_map
+        self.dag = dag
+        self.interactions = two_qubit_interactions(dag) if interactions is None else np.asarray(interactions, dtype=np.int64).reshape(-1, 2)
+        self.workers = workers
+        self.profiler = profiler  # spans "hierarchical_mapping/partition", ".../placement" and the partition_* counters
+        if mapping_options.get("symmetry") not in (None, False):
+            mapping_options["symmetry"] = True  # detected again on the coupling graph of one group
+        self.mapping_options = mapping_options
+        self.deadline_reached = False
+        self.part = None  # part (= index in group_order()) of every logical qubit
+        with self.profiler.span("hierarchical_mapping"):
+            self.maps = [self.calculate_final_map()]
+        self.qpi_rank = {str(self.maps[0]): 0}
+
+    def partition(self, num_logical: int) -> np.ndarray:
+        qpi = InteractionMapping.generate_qpi(self.interactions, num_logical)
+        weights = qpi.toarray()
+        num_parts = min(self.topology.num_group, max(1, -(-num_logical // self.topology.group_size)))
+        part = grow_partition(weights, _part_sizes(num_logical, num_parts))
+        part, swaps = refine_partition(weights, part, num_parts)
+        # renumber the parts so that part i goes to the i-th group of group_order()
+        part_weights = np.zeros((num_parts, num_parts))
+        np.add.at(part_weights, (part[:, None], part[None, :]), weights)
+        rank = np.empty(num_parts, dtype=np.int64)
+        rank[part_order(part_weights)] = np.arange(num_parts)
+        part = rank[part]
+        self.profiler.count("partition_swaps", swaps)
+        self.profiler.count("partition_cut", float(weights[part[:, None] != part[None, :]].sum() / 2))
+        return part
+
+    def calculate_final_map(self) -> list[tuple]:
+        num_logical = self.dag.num_qubits()
+        if num_logical > self.topology.size:
+            raise Exception("Number of qubits greater than device.")
+        with self.profiler.span("partition"):
+            self.part = self.partition(num_logical)
+
+        group_topology = distributed_topology(self.topology.layout_name, self.topology.num_qubits, 1, self.topology.remote_weight)
+        groups = group_order(self.topology)
+        tasks = []
+        for index, group in enumerate(groups):
+            members = np.flatnonzero(self.part == index)
+            if len(members) == 0:
+                continue
+            local = np.full(num_logical, -1, dtype=np.int64)
+            local[members] = np.arange(len(members))
+            pairs = local[self.interactions].reshape(-1, 2)
+            inside = (pairs >= 0).all(axis=1)  # gates between two qubits of the part, in circuit order
+            tasks.append((group, members, (group_topology, pairs[inside], len(members), self.mapping_options)))
+
+        workers = min(self.workers or os.cpu_count() or 1, len(tasks))
+        with self.profiler.span("placement"):
+            if workers <= 1:
+                results = [place_group(*arguments) for _, _, arguments in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(place_group, *zip(*(arguments for _, _, arguments in tasks))))
+
+        final_map = []
+        for (group, members, _), (local_map, deadline_reached) in zip(tasks, results):
+            offset = group * self.topology.group_size
+            final_map.extend((int(members[logical]), offset + int(physical)) for logical, physical in local_map)
+            self.deadline_reached |= deadline_reached
+        return final_map
+
+    def get_best_qpi_layout(self):
+        return list(self.maps[0])
+
+def build_mapping(coupling_map: CouplingMap | DistributedTopology, dag: DAGCircuit, hierarchical: bool = False, **options):
+    # HierarchicalMapping for a topology of several groups with hierarchical=True, InteractionMapping otherwise
+    if hierarchical and isinstance(coupling_map, DistributedTopology) and coupling_map.num_group > 1:
+        return HierarchicalMapping(coupling_map, dag, **options)
+    options.pop("workers", None)
+    return InteractionMapping(coupling_map, dag, **options)
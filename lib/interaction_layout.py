@@ -2,18 +2,41 @@ from qiskit.transpiler import CouplingMap, AnalysisPass, Layout
 from qiskit.transpiler.target import Target
 from qiskit.dagcircuit import DAGCircuit
 from qiskit.transpiler.exceptions import TranspilerError
+from lib.distributed_coupling_map import DistributedTopology
+from lib.hierarchical_mapping import build_mapping
+from lib.interaction_mapping import two_qubit_interactions
+from lib.layout_cache import LayoutCache
+from lib.timer_helper import NULL_PROFILER, NullProfiler, Profiler
 
 class InteractionLayout(AnalysisPass):
-    def __init__(self, coupling_map: CouplingMap, initial_map: list[tuple]):        
+    def __init__(
+        self,
+        coupling_map: CouplingMap | Target | DistributedTopology,
+        initial_map: list[tuple] | None = None,
+        profiler: Profiler = NULL_PROFILER,
+        mapping_options: dict | None = None,
+        layout_cache: LayoutCache | None = None,
+        interactions: tuple[tuple[int, int], ...] | None = None,
+    ):
         super().__init__()
+        self.profiler = profiler # the profiler given to InteractionMapping, reported in property_set["profile"]
+        self.topology = None
         if isinstance(coupling_map, Target):
             self.target = coupling_map
             self.coupling_map = self.target.build_coupling_map()
-            self.initial_map = initial_map
+        elif isinstance(coupling_map, DistributedTopology): # the mapping uses its remote link weights
+            self.target = None
+            self.topology = coupling_map
+            self.coupling_map = coupling_map.coupling_map
         else:
             self.target = None
             self.coupling_map = coupling_map
-            self.initial_map = initial_map
+        self.initial_map = initial_map # None = run InteractionMapping on every circuit
+        self.mapping_options = mapping_options or {} # keyword arguments of InteractionMapping, e.g. beam_width, or hierarchical=True
+        self.layout_cache = layout_cache # computed layouts by interaction graph, shared between runs and passes
+        # two-qubit pairs of the circuit this pass is built for (e.g. from lib/circuit_cache.py), None = read from the DAG;
+        # a tuple and not an array, because Qiskit compares and hashes the arguments of every pass
+        self.interactions = interactions
 
     def build_layout(self, map: list[tuple], dag: DAGCircuit) -> Layout:
         cannonical_register = dag.qregs['q']
@@ -22,6 +45,21 @@ class InteractionLayout(AnalysisPass):
             layout.add(virtual_bit=cannonical_register[logical], physical_bit=physical)
         return layout
 
+    def compute_map(self, dag: DAGCircuit) -> list[tuple]:
+        coupling_map = self.topology or self.coupling_map
+        interactions = self.interactions
+        if self.layout_cache is None:
+            return build_mapping(coupling_map, dag, profiler=self.profiler, interactions=interactions, **self.mapping_options).get_best_qpi_layout()
+        if interactions is None:
+            interactions = two_qubit_interactions(dag)
+        key = LayoutCache.key(interactions, dag.num_qubits(), coupling_map, self.mapping_options)
+        hits = self.layout_cache.hits
+        initial_map = self.layout_cache.get_or_create(key, lambda: build_mapping(
+            coupling_map, dag, profiler=self.profiler, interactions=interactions, **self.mapping_options
+        ))
+        self.profiler.count("layout_cache_hits", self.layout_cache.hits - hits)
+        return initial_map
+
     def run(self, dag: DAGCircuit):
         if self.target is not None:
             if dag.num_qubits() > self.target.num_qubits:
@@ -29,6 +67,11 @@ class InteractionLayout(AnalysisPass):
         elif dag.num_qubits() > self.coupling_map.size():
             raise TranspilerError("Number of qubits greater than device.")
 
-        layout = self.build_layout(self.initial_map, dag)
+        initial_map = self.initial_map
+        if initial_map is None: # computed per run and not kept on the pass
+            initial_map = self.compute_map(dag)
+        layout = self.build_layout(initial_map, dag)
         self.property_set["layout"] = layout
-        return dag
\ No newline at end of file
+        if not isinstance(self.profiler, NullProfiler):
+            self.property_set["profile"] = self.profiler.report()
+        return dag
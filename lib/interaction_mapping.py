@@ -1,31 +1,92 @@
 import ast
+import time
 import numpy as np
+from scipy.sparse import csr_matrix
 from qiskit.transpiler import CouplingMap
 from qiskit.dagcircuit import DAGCircuit
+from lib.coupling_symmetry import CouplingSymmetry
+from lib.distributed_coupling_map import DistributedTopology
+from lib.timer_helper import NULL_PROFILER, Profiler
+
+def two_qubit_interactions(dag: DAGCircuit) -> np.ndarray:
+    # (num_two_qubit_gates, 2) logical qubit pairs in dag.two_qubit_ops() order
+    pairs = [(node.qargs[0]._index, node.qargs[1]._index) for node in dag.two_qubit_ops()]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+class PartialMapping:
+    # one candidate of the search: placed pairs plus the state of every physical qubit as NumPy vectors
+    def __init__(self, num_logical: int, num_physical: int):
+        self.maps = []  # list of tuple (logical qubit q_i, physical qubit Q_i) in placement order
+        self.score = 0  # accumulated QBN value of the placements
+        self.log_to_phy = np.full(num_logical, -1, dtype=np.int64)  # -1 = not placed yet
+        self.free = np.ones(num_physical, dtype=bool)  # physical qubits that are not occupied
+        self.frontier = np.zeros(num_physical, dtype=np.int64)  # number of occupied neighbours per physical qubit
+
+    def copy(self):
+        new_state = PartialMapping.__new__(PartialMapping)
+        new_state.maps = self.maps.copy()
+        new_state.score = self.score
+        new_state.log_to_phy = self.log_to_phy.copy()
+        new_state.free = self.free.copy()
+        new_state.frontier = self.frontier.copy()
+        return new_state
+
+    def place(self, logical: int, physical: int, neighbor_ptr, neighbor_idx, qbn_value=0):
+        # O(degree) update: only the neighbours of the new physical qubit change their frontier count
+        self.maps.append((logical, physical))
+        self.score += qbn_value
+        self.log_to_phy[logical] = physical
+        self.free[physical] = False
+        self.frontier[neighbor_idx[neighbor_ptr[physical] : neighbor_ptr[physical + 1]]] += 1
+
 
 class InteractionMapping:
-    def __init__(self, coupling_map: CouplingMap, dag: DAGCircuit):
+    def __init__(
+        self,
+        coupling_map: CouplingMap | DistributedTopology,
+        dag: DAGCircuit,
+        beam_width: int | None = None,
+        deadline: float | None = None,
+        symmetry: CouplingSymmetry | bool = False,
+        profiler: Profiler = NULL_PROFILER,
+        interactions: np.ndarray | None = None,
+        seed: int | None = None,
+    ):
         super().__init__()
-        self.coupling_map = coupling_map
+        if isinstance(coupling_map, DistributedTopology):  # reuse the precomputed neighbour arrays
+            self.topology = coupling_map
+            self.coupling_map = coupling_map.coupling_map
+        else:
+            self.topology = None
+            self.coupling_map = coupling_map
+        if dag.num_qubits() > self.coupling_map.size():
+            raise ValueError(f"Circuit has {dag.num_qubits()} qubits, the coupling map only {self.coupling_map.size()}.")
         self.dag = dag
+        # (num_two_qubit_gates, 2) logical pairs in gate order, e.g. precomputed by lib/circuit_cache.py
+        self.interactions = two_qubit_interactions(dag) if interactions is None else np.asarray(interactions, dtype=np.int64).reshape(-1, 2)
+        self.beam_width = beam_width  # keep only the best `beam_width` partial maps per step, None = keep every tie
+        self.deadline = deadline  # wall-clock budget in seconds, after that only the best partial map is expanded
+        self.deadline_reached = False
+        if symmetry is True:  # detect the automorphisms of the coupling map
+            symmetry = CouplingSymmetry.from_coupling_map(self.coupling_map)
+        self.symmetry = symmetry or None  # keep one partial map per equivalence class of the topology symmetry
         self.maps = []  # return tuple (logical qubit q_i, physical qubit Q_i)
-        self.assigned_qubits = []
-        self.assigned_physical_qubits = []
+        self.states = []  # PartialMapping per entry of self.maps
         self.qpi_rank = {}  # dict key = map of tuple(log, phy); value = total_qpi_value
         self.swap_add = 0 # TODO:
+        self.profiler = profiler  # spans "interaction_mapping/qpi", ".../search" and the mapping_* counters
+        # None = ties go to the first candidate, a seed picks a random one of them (one trial of lib/multi_trial.py)
+        self.rng = np.random.default_rng(seed) if seed is not None else None
         # run calculation
-        self.calculate_final_maps()
+        with self.profiler.span("interaction_mapping"):
+            self.calculate_final_maps()
 
+    @staticmethod
     def calculate_logical_priority(
-        self, dag: DAGCircuit
-    ):  # the total number of operation gates in logical wire
-        priority_dict = {qubit: 0 for qubit in range(dag.num_qubits())}
-        for node in dag.two_qubit_ops():
-            for qubit in [
-                qubit._index for qubit in node.qargs
-            ]:  # handle two-qubit gate only
-                priority_dict[qubit] += 1
-        return priority_dict
+        interactions: np.ndarray, num_qubits: int
+    ):  # the total number of two-qubit gates per logical wire
+        counts = np.bincount(interactions.reshape(-1), minlength=num_qubits)
+        return dict(enumerate(counts.tolist()))
 
     def calculate_physical_connectivity(
         self, coupling_map: CouplingMap
@@ -36,78 +97,62 @@ class InteractionMapping:
         }
 
     def calculate_physical_neighbors(self, coupling_map: CouplingMap):
-        return {
-            qubit: list(iter(coupling_map.neighbors(qubit)))
-            for qubit in coupling_map.physical_qubits
-        }
+        # CSR layout: neighbours of physical qubit Q are neighbor_idx[neighbor_ptr[Q]:neighbor_ptr[Q + 1]]
+        neighbors = [
+            sorted(set(coupling_map.neighbors(qubit)))
+            for qubit in range(coupling_map.size())
+        ]
+        neighbor_ptr = np.zeros(len(neighbors) + 1, dtype=np.int64)
+        neighbor_ptr[1:] = np.cumsum([len(n) for n in neighbors])
+        neighbor_idx = np.fromiter(
+            (q for n in neighbors for q in n), dtype=np.int64, count=neighbor_ptr[-1]
+        )
+        return neighbor_ptr, neighbor_idx
 
-    def calculate_logical_neighbors(self, dag: DAGCircuit):
-        neighbor_dict = {qubit: [] for qubit in range(dag.num_qubits())}
-        for node in dag.two_qubit_ops():
-            log0, log1 = node.qargs[0]._index, node.qargs[1]._index
-            if log1 not in neighbor_dict[log0]:
-                neighbor_dict[log0].append(log1)
-            if log0 not in neighbor_dict[log1]:
-                neighbor_dict[log1].append(log0)
-        return neighbor_dict
-
-    def generate_qpi(self, dag: DAGCircuit):  # Qubit Pair (QP) Interaction
-        total_two_gate = len(dag.two_qubit_ops())
-        weight_gate = list(range(total_two_gate, 0, -1))
-        interaction = np.zeros(shape=(dag.num_qubits(), dag.num_qubits()))
-        for index, node in enumerate(dag.two_qubit_ops()):
-            log0, log1 = node.qargs[0]._index, node.qargs[1]._index
-            interaction[log0][log1] += weight_gate[index]
-            interaction[log1][log0] += weight_gate[index]
+    @staticmethod
+    def generate_qpi(interactions: np.ndarray, num_qubits: int) -> csr_matrix:  # Qubit Pair (QP) Interaction
+        # symmetric sparse matrix, an earlier gate weighs more: gate i of m adds m - i to its pair
+        weight_gate = np.arange(len(interactions), 0, -1, dtype=float)
+        rows = np.concatenate([interactions[:, 0], interactions[:, 1]])
+        cols = np.concatenate([interactions[:, 1], interactions[:, 0]])
+        interaction = csr_matrix((np.tile(weight_gate, 2), (rows, cols)), shape=(num_qubits, num_qubits))
+        interaction.sum_duplicates()  # also sorts the neighbours of every row
         return interaction
 
-    def adjacent_physical_qubits(
-        self, assigned_physical_qubits, physical_neighbors: dict
-    ) -> dict:
-        adj = {}
-        for physical_qubit in assigned_physical_qubits:
-            adj[physical_qubit] = [
-                phy_bit
-                for phy_bit in physical_neighbors[physical_qubit]
-                if phy_bit not in assigned_physical_qubits
-            ]
-
-        return adj
-
-    def has_no_neighbor(
-        self, curr_qubit: int, assigned_qubits: list, logical_neighbors: dict[int, list]
-    ) -> bool:
-        return all(
-            curr_qubit not in logical_neighbors[assigned]
-            for assigned in assigned_qubits
-        )
-
-    def calculate_highest_qbn(
-        self, curr_logical_qubit, neighbors_physical_qubits, qpi_matrix, maps
+    def calculate_qbn(
+        self, state: PartialMapping, curr_logical_qubit, qpi_matrix, neighbor_ptr, neighbor_idx, neighbor_cost=None
     ):
-        qbn = {}
-        for assigned, available in neighbors_physical_qubits.items():
-            logical_from_assigned = next(t[0] for t in maps if t[1] == assigned)
-            for candidate in available:
-                qbn[candidate] = (
-                    qbn.get(candidate, 0)
-                    + qpi_matrix[logical_from_assigned][curr_logical_qubit]
-                )
-            max_qbn_value = max(qbn.values(), default=0)
-            if all(qbn.values()) == 0:
-            # check if all QBN value is 0, then choose the first node
-                qbn = {next(iter(qbn)) : 0} 
-            else:
-                qbn = {k: v for k, v in qbn.items() if v == max_qbn_value}
-        return qbn, max_qbn_value
+        # QBN of a free physical qubit = sum of QPI between the current logical qubit and the
+        # logical qubits already placed on its physical neighbours, divided by the link cost if given
+        row = slice(qpi_matrix.indptr[curr_logical_qubit], qpi_matrix.indptr[curr_logical_qubit + 1])
+        logical_neighbors, row_weights = qpi_matrix.indices[row], qpi_matrix.data[row]
+        positions = state.log_to_phy[logical_neighbors]
+        placed = positions >= 0
+        if not placed.any():
+            return None  # no interacting logical qubit has been placed yet
+        positions, weights = positions[placed], row_weights[placed]
+        starts, counts = neighbor_ptr[positions], neighbor_ptr[positions + 1] - neighbor_ptr[positions]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        qbn = np.zeros(len(state.free))
+        entries = np.repeat(starts, counts) + offsets
+        contribution = np.repeat(weights, counts)
+        if neighbor_cost is not None:
+            contribution = contribution / neighbor_cost[entries]
+        np.add.at(qbn, neighbor_idx[entries], contribution)
+        return qbn
 
     def highest_index(self, dicts) -> int:
         index = max(dicts, key=dicts.get)
+        if self.rng is not None:
+            ties = [key for key, value in dicts.items() if value == dicts[index]]
+            index = ties[self.rng.integers(len(ties))]
         return index
 
-    def extract_tuple(self, maps):
-        return [t[0] for t in maps], [t[1] for t in maps]
-    
+    def argmax(self, values: np.ndarray) -> int:
+        if self.rng is None:
+            return int(np.argmax(values))
+        return int(self.rng.choice(np.flatnonzero(values == values.max())))
+
     def most_frequent_value(self, dicts):
     # Create a frequency dictionary to count occurrences of each value
         frequency_dict = {}
@@ -116,29 +161,64 @@ class InteractionMapping:
                 frequency_dict[value] += 1
             else:
                 frequency_dict[value] = 1
-        
+
         # Find the value with the maximum occurrence
         most_frequent = max(frequency_dict, key=frequency_dict.get)
         return most_frequent, frequency_dict[most_frequent]
 
-    def add_mapping(self, pairs, m, max_qpi_value=0):
-        new_mappings = []
-        for mapping in m:
-            if str(mapping) in self.qpi_rank:
-                last_qpi_value = self.qpi_rank.pop(str(mapping))
-            else:
-                last_qpi_value = 0
-            for pair in pairs:
-                new_mapping = mapping.copy()  # Create a new list for each mapping
-                new_mapping.append(pair)  # Add the pair to the new mapping
-                self.qpi_rank[str(new_mapping)] = last_qpi_value + max_qpi_value
-                new_mappings.append(new_mapping)  # Append the new mapping to the result
-        return new_mappings
+    def expand_state(
+        self, state: PartialMapping, curr_qubit, qpi_matrix, connectivity, neighbor_ptr, neighbor_idx, neighbor_cost=None
+    ):
+        qbn = self.calculate_qbn(state, curr_qubit, qpi_matrix, neighbor_ptr, neighbor_idx, neighbor_cost)
+        candidates = state.free & (state.frontier > 0)
+        if qbn is None or not candidates.any() or qbn[candidates].max() == 0:
+            # no useful neighbourhood: take the unassigned physical qubit with the highest PCS (Physical Connectivity Strength)
+            pool = candidates if qbn is not None and candidates.any() else state.free
+            best_physical_bits, max_qpi_value = [self.argmax(np.where(pool, connectivity, -1))], 0
+        else:
+            # Choose every physical location with the highest QBN (Qubit Interaction Neighborhood).
+            max_qpi_value = qbn[candidates].max()
+            best_physical_bits = np.flatnonzero(candidates & (qbn == max_qpi_value)).tolist()
+
+        new_states = []
+        for physical in best_physical_bits:
+            new_state = state.copy()
+            new_state.place(curr_qubit, physical, neighbor_ptr, neighbor_idx, max_qpi_value)
+            new_states.append(new_state)
+        return new_states
+
+    def prune_states(self, states, width):
+        # keep the `width` partial maps with the highest QPI rank, ties keep insertion order
+        if len(states) <= width:
+            return states
+        return sorted(states, key=lambda state: state.score, reverse=True)[:width]
+
+    def prune_symmetric_states(self, states):
+        # drop partial maps that are an automorphism image of an earlier one
+        unique, seen = [], set()
+        for state in states:
+            logicals, physicals = np.array(state.maps, dtype=np.int64).T
+            key = self.symmetry.canonical_key(logicals, physicals)
+            if key not in seen:
+                seen.add(key)
+                unique.append(state)
+        return unique
+
+    def past_deadline(self, start: float) -> bool:
+        # sets deadline_reached as soon as the elapsed time passes the budget
+        if self.deadline is not None and time.perf_counter() - start > self.deadline:
+            self.deadline_reached = True
+        return self.deadline_reached
+
+    def is_bounded(self):
+        return self.beam_width is not None or self.deadline is not None
 
     def calculate_final_maps(self):
+        start = time.perf_counter()
         # initialize
-        qpi_matrix = self.generate_qpi(self.dag)
-        logical_priority = self.calculate_logical_priority(self.dag)
+        with self.profiler.span("qpi"):
+            qpi_matrix = self.generate_qpi(self.interactions, self.dag.num_qubits())
+            logical_priority = self.calculate_logical_priority(self.interactions, self.dag.num_qubits())
         physical_connectivity = self.calculate_physical_connectivity(self.coupling_map)
 
         # check if fully connected, return corresponding index
@@ -147,61 +227,52 @@ class InteractionMapping:
             self.maps = [[(idx, idx) for idx in range(self.dag.num_qubits())]]
             self.qpi_rank[str(self.maps[0])] = self.coupling_map.physical_qubits
             return self.maps
-        
-        logical_neighbors = self.calculate_logical_neighbors(self.dag)
-        physical_neighbors = self.calculate_physical_neighbors(self.coupling_map)
+
+        if self.topology is not None:  # remote links count less towards the QBN
+            neighbor_ptr, neighbor_idx = self.topology.neighbor_arrays
+            neighbor_cost = self.topology.neighbor_costs
+        else:
+            neighbor_ptr, neighbor_idx = self.calculate_physical_neighbors(self.coupling_map)
+            neighbor_cost = None
+        connectivity = np.diff(neighbor_ptr)
 
         # Assign first priority logical qubit to highest physical connectivity qubit
         high_logical = self.highest_index(logical_priority)
         high_physical = self.highest_index(physical_connectivity)
         logical_priority.pop(high_logical)
-        self.maps = [[(high_logical, high_physical)]]
-
-        while logical_priority:
-            if self.swap_add > 1000:
-                raise Exception("InteractionLayout timeout.")
-            for i in range(len(self.maps)):
-                self.swap_add += 1
-                m = self.maps.pop(0)
-                # get highest value from dictionary, return key
-                curr_qubit = self.highest_index(
-                    logical_priority
-                )  # Get the logical qubit with the highest QPI (Quantum Priority Index).
-                curr_neighbors = logical_neighbors[
-                    curr_qubit
-                ]  # Obtain the logical neighbors of the current qubit.
-                self.assigned_qubits, self.assigned_physical_qubits = (
-                    self.extract_tuple(m)
-                )
-                temp_physical_connectivity = {
-                    k: v
-                    for k, v in physical_connectivity.items()
-                    if k not in self.assigned_physical_qubits
-                }  # only take physical qubits that are not occupied
-                if self.has_no_neighbor(
-                    curr_qubit, self.assigned_qubits, logical_neighbors
-                ):
-                    best_physical_bit = self.highest_index(
-                        temp_physical_connectivity
-                    )  # Get the unassigned physical qubit with the highest PCS (Physical Connectivity Strength).
-                    m_temp = self.add_mapping([(curr_qubit, best_physical_bit)], [m])
-
-                else:
-                    neighbors_physical_qubits = self.adjacent_physical_qubits(
-                        self.assigned_physical_qubits, physical_neighbors
-                    )
-                    best_physical_bit, max_qpi_value = self.calculate_highest_qbn(
-                        curr_qubit, neighbors_physical_qubits, qpi_matrix, m
-                    )  # Choose the physical location with the highest QBN (Qubit Interaction Neighborhood).
-                    m_temp = self.add_mapping(
-                        [(curr_qubit, phy) for phy in best_physical_bit.keys()],
-                        [m],
-                        max_qpi_value,
+        first_state = PartialMapping(self.dag.num_qubits(), self.coupling_map.size())
+        first_state.place(high_logical, high_physical, neighbor_ptr, neighbor_idx)
+        self.states = [first_state]
+
+        with self.profiler.span("search"):
+            while logical_priority:
+                if self.swap_add > 1000 and not self.is_bounded():
+                    raise Exception("InteractionLayout timeout.")
+                if self.past_deadline(start):
+                    # out of time: finish greedily from the best partial map found so far
+                    self.states = self.prune_states(self.states, 1)
+                # Get the logical qubit with the highest QPI (Quantum Priority Index).
+                curr_qubit = self.highest_index(logical_priority)
+                new_states = []
+                for state in self.states:
+                    if new_states and self.past_deadline(start):
+                        break  # out of time in the middle of a step, one step can expand thousands of tied maps
+                    self.swap_add += 1
+                    new_states.extend(
+                        self.expand_state(state, curr_qubit, qpi_matrix, connectivity, neighbor_ptr, neighbor_idx, neighbor_cost)
                     )
+                self.states = new_states
+                logical_priority.pop(curr_qubit)
+                self.profiler.count("mapping_states_expanded", len(new_states))
+                if self.symmetry is not None:
+                    self.states = self.prune_symmetric_states(self.states)
+                    self.profiler.count("mapping_symmetric_pruned", len(new_states) - len(self.states))
+                if self.beam_width is not None:
+                    self.states = self.prune_states(self.states, self.beam_width)
 
-                for temp in m_temp:
-                    self.maps.append(temp)
-            logical_priority.pop(curr_qubit)
+        self.past_deadline(start)  # the greedy finish can run past the budget as well
+        self.maps = [state.maps for state in self.states]
+        self.qpi_rank = {str(state.maps): state.score for state in self.states}
         return self.maps
 
     def get_best_qpi_layout(self):
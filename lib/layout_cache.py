@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+from qiskit.transpiler import CouplingMap
+from qiskit.transpiler.target import Target
+
+from lib.distributed_coupling_map import DistributedTopology
+from lib.file_cache import load_entry, trim_directory, write_atomic
+from lib.interaction_mapping import InteractionMapping
+
+"""
+Memoized InteractionMapping results (get_best_qpi_layout()), so compiling a circuit again skips the mapping.
+
+An entry is keyed by the weighted interaction graph (the sparse QPI matrix and the per-qubit gate counts the
+mapping is computed from), the weighted coupling graph and the mapping options. Two circuits with the same
+interaction graph, e.g. the members of one parameterized ansatz family, share an entry. The in-memory tier
+keeps the max_entries most recently used layouts; with a directory every layout is also written there as
+JSON and the directory is trimmed to max_bytes, least recently used first (lib/file_cache.py).
+"""
+
+LAYOUT_CACHE_DIR = "result/layout_cache"
+
+def _coupling_arrays(coupling_map: CouplingMap | Target | DistributedTopology) -> tuple[np.ndarray, np.ndarray]:
+    # sorted directed edges and their link costs; a plain coupling map has cost 1 everywhere like the mapping assumes
+    if isinstance(coupling_map, DistributedTopology):
+        edges, weights = np.asarray(coupling_map.edges), np.asarray(coupling_map.edge_weights, dtype=float)
+    else:
+        if isinstance(coupling_map, Target):
+            coupling_map = coupling_map.build_coupling_map()
+        edges = np.array(coupling_map.get_edges(), dtype=np.int64).reshape(-1, 2)
+        weights = np.ones(len(edges))
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    return edges[order].astype(np.int64), weights[order]
+
+class LayoutCache:
+    def __init__(self, max_entries: int = 256, directory: str | None = None, max_bytes: int = 64 * 1024**2):
+        self.max_entries = max_entries
+        self.directory = directory  # None = memory only
+        self.max_bytes = max_bytes
+        self.layouts = OrderedDict()  # key -> layout, least recently used first
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(interactions: np.ndarray, num_qubits: int, coupling_map: CouplingMap | Target | DistributedTopology,
+            mapping_options: dict | None = None) -> str:
+        interactions = np.asarray(interactions, dtype=np.int64).reshape(-1, 2)
+        qpi = InteractionMapping.generate_qpi(interactions, num_qubits)  # canonical CSR: sorted, duplicates summed
+        priority = np.bincount(interactions.reshape(-1), minlength=num_qubits)
+        edges, weights = _coupling_arrays(coupling_map)
+        digest = hashlib.sha256()
+        digest.update(np.int64(num_qubits).tobytes())
+        for array in (qpi.indptr.astype(np.int64), qpi.indices.astype(np.int64), qpi.data, priority.astype(np.int64), edges, weights):
+            digest.update(np.int64(array.size).tobytes())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        # options that are objects (e.g. a CouplingSymmetry of this coupling map) only contribute their type
+        options = json.dumps(mapping_options or {}, sort_keys=True, default=lambda value: type(value).__name__)
+        digest.update(options.encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> list[tuple] | None:
+        if key in self.layouts:
+            self.layouts.move_to_end(key)
+            self.hits += 1
+            return self.layouts[key]
+        layout = self._load(key) if self.directory else None
+        if layout is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, layout)
+        return layout
+
+    def put(self, key: str, layout: list[tuple]):
+        layout = [tuple(pair) for pair in layout]
+        self._remember(key, layout)
+        if self.directory:
+            self._store(key, layout)
+            self.evict()
+
+    def get_or_create(self, key: str, compute) -> list[tuple]:
+        # compute() returns the mapping (InteractionMapping or HierarchicalMapping); a layout cut short by the
+        # deadline depends on the machine load, so it is used but not stored
+        layout = self.get(key)
+        if layout is None:
+            mapping = compute()
+            layout = mapping.get_best_qpi_layout()
+            if not mapping.deadline_reached:
+                self.put(key, layout)
+        return layout
+
+    def _remember(self, key: str, layout: list[tuple]):
+        self.layouts[key] = layout
+        self.layouts.move_to_end(key)
+        while len(self.layouts) > self.max_entries:
+            self.layouts.popitem(last=False)
+
+    def _load(self, key: str) -> list[tuple] | None:
+        def load():
+            with open(self._path(key)) as layout_file:
+                return [tuple(pair) for pair in json.load(layout_file)]
+        return load_entry([self._path(key)], load)
+
+    def _store(self, key: str, layout: list[tuple]):
+        write_atomic(self._path(key), lambda f: json.dump(layout, f))
+
+    def evict(self):
+        trim_directory(self.directory, (".json",), self.max_bytes)
@@ -1,180 +1,365 @@
-from qiskit.transpiler import CouplingMap, TransformationPass, Layout
+import copy
+from itertools import islice
+from functools import lru_cache
+import numpy as np
+import rustworkx as rx
+from qiskit.transpiler import CouplingMap, Layout, TransformationPass
 from qiskit.transpiler.target import Target
 from qiskit.dagcircuit import DAGCircuit, DAGOpNode
 from qiskit.transpiler.exceptions import TranspilerError
 from qiskit.circuit.library.standard_gates import SwapGate
+from lib.distributed_coupling_map import DistributedTopology
+from lib.timer_helper import NULL_PROFILER, NullProfiler, Profiler
+
+@lru_cache(maxsize=32)
+def _coupling_structure(num_qubits: int, edges: tuple):
+    graph = rx.PyDiGraph()
+    graph.add_nodes_from(range(num_qubits))
+    graph.add_edges_from_no_data(list(edges))
+    distance = rx.digraph_distance_matrix(graph, as_undirected=True).astype(np.int64)
+    distance.setflags(write=False)
+    # sorted, because CouplingMap.neighbors() comes from a hash set and its order changes between runs
+    neighbors = tuple(tuple(sorted(graph.successor_indices(qubit))) for qubit in range(num_qubits))
+    return distance, neighbors
+
+def coupling_structure(coupling_map: CouplingMap):
+    # all-pairs hop distance and neighbour lists, shared by every pass instance built on the same coupling graph
+    return _coupling_structure(coupling_map.size(), tuple(sorted(coupling_map.get_edges())))
+
+def stream_layers(dag: DAGCircuit):
+    """Op nodes of the DAG layer by layer, the same grouping and order as dag.layers().
+
+    Only the current layer and the pending predecessor counts of its successors are held, so reading a
+    window of layers costs memory for that window and not for the whole circuit.
+    """
+    pending = {}  # node id -> predecessors not yielded yet
+    layer = sorted(dag.front_layer(), key=lambda node: node._node_id)
+    while layer:
+        yield layer
+        next_layer = []
+        for node in layer:
+            for successor in dag.op_successors(node):
+                node_id = successor._node_id
+                if node_id not in pending:
+                    pending[node_id] = sum(1 for _ in dag.op_predecessors(successor))
+                pending[node_id] -= 1
+                if pending[node_id] == 0:
+                    del pending[node_id]
+                    next_layer.append(successor)
+        layer = sorted(next_layer, key=lambda node: node._node_id)
+
+class GateIndex:
+    """Gates of a DAG in layer order, built with a single topological pass.
+
+    Layer k holds the gates layer_ptr[k]:layer_ptr[k + 1], the same grouping as dag.layers() without
+    building a sub-DAG per layer. The two-qubit gates of every qubit are stored back to back in
+    dep_gates (dep_ptr per qubit) and consumed by moving the cursor dep_pos instead of popping a list.
+    With `layers` (lists of op nodes, e.g. a window from stream_layers) only those gates are indexed.
+    """
+    def __init__(self, dag: DAGCircuit, layers: list[list[DAGOpNode]] | None = None):
+        num_qubits = dag.num_qubits()
+        if layers is None:
+            nodes, layer_of = self.layer_nodes(dag)
+        else:
+            nodes = [node for layer in layers for node in layer]
+            layer_of = np.repeat(np.arange(len(layers), dtype=np.int64), [len(layer) for layer in layers])
+        qubits = []
+        for node in nodes:
+            qargs = [dag.find_bit(qubit).index for qubit in node.qargs]
+            qubits.append(qargs if len(qargs) == 2 and node.name != "barrier" else (-1, -1))
+        self.op_gates = nodes
+        self.gate_qubits = np.array(qubits, dtype=np.int64).reshape(-1, 2)  # -1 for gates that are not routed
+        self.is_two_qubit = self.gate_qubits[:, 0] >= 0
+        self.layer_ptr = np.searchsorted(layer_of, np.arange(layer_of[-1] + 2 if len(layer_of) else 1))
+
+        # per-qubit dependency list of two-qubit gates, in gate order
+        gate_ids = np.flatnonzero(self.is_two_qubit)
+        owners = self.gate_qubits[gate_ids].reshape(-1)
+        by_qubit = np.argsort(owners, kind="stable")
+        self.dep_gates = np.repeat(gate_ids, 2)[by_qubit]
+        self.dep_ptr = np.zeros(num_qubits + 1, dtype=np.int64)
+        self.dep_ptr[1:] = np.cumsum(np.bincount(owners, minlength=num_qubits))
+        self.dep_pos = self.dep_ptr[:-1].copy()
+
+    @staticmethod
+    def layer_nodes(dag: DAGCircuit):
+        # every op node with its layer (longest path from the inputs over qubit and clbit wires), sorted by layer
+        qubit_layer = np.zeros(dag.num_qubits(), dtype=np.int64)  # first free layer per wire
+        clbit_layer = np.zeros(dag.num_clbits(), dtype=np.int64)
+        nodes, layers = [], []
+        for node in dag.topological_op_nodes():
+            qargs = [dag.find_bit(qubit).index for qubit in node.qargs]
+            cargs = [dag.find_bit(clbit).index for clbit in node.cargs]
+            layer = max([qubit_layer[q] for q in qargs] + [clbit_layer[c] for c in cargs], default=0)
+            qubit_layer[qargs] = layer + 1
+            clbit_layer[cargs] = layer + 1
+            nodes.append(node)
+            layers.append(layer)
+
+        # inside a layer keep the node id order, the same order dag.layers() yields
+        order = np.lexsort((np.array([node._node_id for node in nodes], dtype=np.int64), np.array(layers, dtype=np.int64)))
+        return [nodes[idx] for idx in order.tolist()], np.array(layers, dtype=np.int64)[order]
+
+    def num_layers(self) -> int:
+        return len(self.layer_ptr) - 1
+
+    def advance(self, gate_idx: int):
+        # the gate has been routed: it is the head of the dependency list of both its qubits
+        self.dep_pos[self.gate_qubits[gate_idx]] += 1
+
+    def upcoming(self, qubits: np.ndarray, offset: int, block: int) -> np.ndarray:
+        # (len(qubits), block) matrix of the next two-qubit gates after `offset`, -1 past the end of a list
+        start = self.dep_pos[qubits, None] + offset + np.arange(block)[None, :]
+        inside = start < self.dep_ptr[qubits + 1, None]
+        return np.where(inside, self.dep_gates[np.where(inside, start, 0)], -1)
+
+    def remaining(self, qubits: np.ndarray) -> np.ndarray:
+        return self.dep_ptr[qubits + 1] - self.dep_pos[qubits]
+
 
 class DynamicLookaheadSwap(TransformationPass):
-    def __init__(self, coupling_map):
+    def __init__(
+        self, coupling_map, stall_limit: int | None = None, profiler: Profiler = NULL_PROFILER, window: int | None = None,
+        seed: int | None = None,
+    ):
         super().__init__()
         if isinstance(coupling_map, Target):
             self.target = coupling_map
             self.coupling_map = self.target.build_coupling_map()
+        elif isinstance(coupling_map, DistributedTopology):  # reuse the precomputed distance and neighbours
+            self.target = None
+            self.coupling_map = coupling_map.coupling_map
         else:
             self.target = None
             self.coupling_map = coupling_map
-        self.dlist = [] # SAVE as index, instead of DAGOpNode; only for two-qubit gates
-        self.op_gates = [] # SAVE reference of gate
+        if isinstance(coupling_map, DistributedTopology):
+            self.distance, self.neighbors = coupling_map.distance_matrix, coupling_map.neighbor_lists
+            self.cost = coupling_map.cost_matrix  # shortest path cost with the remote link weights
+        else:
+            self.distance, self.neighbors = coupling_structure(self.coupling_map)
+            self.cost = self.distance
+        # lookahead swaps allowed without routing a gate before the escape mode takes over, default = diameter
+        self.stall_limit = stall_limit if stall_limit is not None else int(self.distance.max(initial=1))
+        # streaming mode: layers routed per window, the lookahead sees at most `window` layers past the window
+        # (None = index and look ahead over the whole circuit)
+        if window is not None and window < 1:
+            raise TranspilerError("Routing window must hold at least one layer.")
+        self.window = window
+        self.seed = seed # None = ties go to the first candidate, a seed picks a random one (see lib/multi_trial.py)
+        self.rng = None
+        # per-run state below is only set on the copy that run() routes with, the pass itself stays unchanged
+        self.gates = None # GateIndex of the DAG being routed
+        self.log_to_phy = np.empty(0, dtype=np.int64) # current physical position of every wire of the input DAG
+        self.phy_to_log = np.empty(0, dtype=np.int64) # inverse of log_to_phy
         self.swap_add = 0
+        self.swap_count = 0 # SWAP gates inserted by the last run
+        self.profiler = profiler # spans "lookahead_routing/..." and the routing counters, reported in property_set["profile"]
 
-    def list_gates(self, dag: DAGCircuit): # populate gates at current_idx because list(iter(dag.op_nodes())) shuffled bcs of greedy algorithm
-        gate_list = []
-        for layer in dag.layers():
-            for node in layer['graph'].op_nodes():
-                gate_list.append(node)
-        return gate_list
-
-    def list_gates_on_qubit_dag(self, dag: DAGCircuit): # TODO: LIST_GATE ALREADY layers(), but dependency list NOT YET
-        index = 0
-        dependency_list = {qubit: [] for qubit in range(dag.num_qubits())}
-        for layer in dag.layers():
-            for operation in layer['graph'].op_nodes():
-                qubits = [qubit._index for qubit in operation.qargs]
-                if len(qubits) == 2: # HANDLE ONLY TWO-QUBIT GATE IN DEPENDENCY LIST
-                    for qubit in qubits: # handle single and two-qubit gate
-                        dependency_list[qubit].append(index)
-                index += 1
-        return dependency_list
-    
-    def generate_possible_swaps(self, act_list: list[int], coupling_map: CouplingMap, current_layout: Layout, assigned_swap: list[tuple]):
+    def generate_possible_swaps(self, act_list: list[int], assigned_swap: list[tuple]):
         candi_list = []
+        seen = {tuple(sorted(swap)) for swap in assigned_swap}
         for act_idx in act_list:
-            node = self.op_gates[act_idx]
-            phy0, phy1 = current_layout.get_virtual_bits()[node.qargs[0]], current_layout.get_virtual_bits()[node.qargs[1]]
-            candi_list.extend([(phy0, neighbor) for neighbor in coupling_map.neighbors(phy0) if (phy0, neighbor) not in assigned_swap + candi_list and (neighbor, phy0) not in assigned_swap + candi_list])
-            candi_list.extend([(phy1, neighbor) for neighbor in coupling_map.neighbors(phy1) if (phy1, neighbor) not in assigned_swap + candi_list and (neighbor, phy1) not in assigned_swap + candi_list])
+            for log in self.gates.gate_qubits[act_idx].tolist():
+                phy = int(self.log_to_phy[log])
+                for neighbor in self.neighbors[phy]:
+                    if (min(phy, neighbor), max(phy, neighbor)) not in seen:
+                        seen.add((min(phy, neighbor), max(phy, neighbor)))
+                        candi_list.append((phy, neighbor))
         return candi_list
+
+    def apply_swap(self, phy0: int, phy1: int, new_dag: DAGCircuit):
+        # O(1) layout update, the SWAP goes straight to the output DAG on the two physical wires
+        log0, log1 = self.phy_to_log[phy0], self.phy_to_log[phy1]
+        self.phy_to_log[phy0], self.phy_to_log[phy1] = log1, log0
+        self.log_to_phy[log0], self.log_to_phy[log1] = phy1, phy0
+        self.swap_count += 1
+        new_dag.apply_operation_back(SwapGate(), qargs=(self.cannonical_register[phy0], self.cannonical_register[phy1]), cargs=())
     
-    def calc_effect_gate(self, node: DAGOpNode, swap_nodes: tuple, coupling_map: CouplingMap, current_layout: Layout):
-        idx0, idx1 = node.qargs[0]._index, node.qargs[1]._index
-        phy0, phy1 = current_layout.get_virtual_bits()[node.qargs[0]], current_layout.get_virtual_bits()[node.qargs[1]]
-        old_distance = self.coupling_map.distance(phy0, phy1)
-        if phy0 in swap_nodes:
-            phy0 = swap_nodes[1] if phy0 == swap_nodes[0] else swap_nodes[0]
-        if phy1 in swap_nodes:
-            phy1 = swap_nodes[1] if phy1 == swap_nodes[0] else swap_nodes[0]
-            
-        new_distance = coupling_map.distance(phy0, phy1)
-        return old_distance - new_distance
-    
-    """gate_list = in logical qubit"""
-    def sum_effect(self, gate_list: list[int], act_list: list[int], swap: tuple, coupling_map: CouplingMap, current_layout: Layout, str):
-        is_remove = False
-        total_sum = 0
-        for gate_idx in gate_list:
-            node = self.op_gates[gate_idx]
-            if node.op.num_qubits == 2 and node.name not in ["barrier", "measure"]: # TODO: don't calculate if barrier or measure gate AND make sure that only lookahead for next wo-qubit gates ONLY
-                value = self.calc_effect_gate(node=node, swap_nodes=swap, coupling_map=coupling_map, current_layout=current_layout)
-                if value < 0 and gate_idx in act_list:
-                    is_remove = True
-                    return total_sum, is_remove
-                elif value < 0:
-                    break
-                elif value == 0 or value == 1:
-                    total_sum += value
-
-        return total_sum, is_remove
-    
-    def check_gate_connectivity(self, act_list: list[int], new_dag: DAGCircuit, current_layout: Layout):
+    def calc_mcpe_cost(self, candi_list: list[tuple], act_list: list[int]) -> np.ndarray:
+        """MCPE of every candidate swap in one pass, -inf for swaps that move an active gate further apart.
+
+        For both logical qubits of a swap, the upcoming two-qubit gates on that qubit are scored by the
+        change of link cost (old - new), summed until the first gate that gets further apart. A swap over a
+        remote link is charged the extra cost of its three CX gates, 3 * (link cost - 1).
+        """
+        log_to_phy, phy_to_log = self.log_to_phy, self.phy_to_log
+        swaps = np.array(candi_list, dtype=np.int64)  # (candidates, 2) physical qubits
+        active = np.zeros(len(self.gates.op_gates), dtype=bool)
+        active[act_list] = True
+
+        # one row per (candidate, side): the logical qubit sitting on swaps[:, side] moves to the other end
+        rows_src = swaps.reshape(-1)
+        rows_dst = swaps[:, ::-1].reshape(-1)
+        rows_log = phy_to_log[rows_src]
+        remaining = self.gates.remaining(rows_log)
+        total = np.zeros(len(rows_log))
+        remove = np.zeros(len(rows_log), dtype=bool)
+        running = np.ones(len(rows_log), dtype=bool)
+
+        # most rows stop after a few gates, so scan the dependency lists in growing blocks instead of in full
+        offset, block = 0, 8
+        while True:
+            rows = np.flatnonzero(running & (remaining > offset))
+            if len(rows) == 0:
+                break
+            gates = self.gates.upcoming(rows_log[rows], offset, block)
+            valid = gates >= 0
+            gates_safe = np.where(valid, gates, 0)
+
+            pair = self.gates.gate_qubits[gates_safe]
+            partner = np.where(pair[..., 0] == rows_log[rows, None], pair[..., 1], pair[..., 0])
+            partner_phy = log_to_phy[partner]
+            src, dst = rows_src[rows, None], rows_dst[rows, None]
+            moved_partner = np.where(partner_phy == dst, src, np.where(partner_phy == src, dst, partner_phy))
+            value = self.cost[src, partner_phy] - self.cost[dst, moved_partner]
+            value = np.where(valid, value, 0)
+
+            negative = value < 0
+            has_negative = negative.any(axis=1)
+            first_negative = np.argmax(negative, axis=1)
+            stop = np.where(has_negative, first_negative, block)
+            before_stop = np.arange(block)[None, :] < stop[:, None]
+            total[rows] += np.where(before_stop, np.maximum(value, 0), 0).sum(axis=1)
+            remove[rows] = has_negative & active[gates_safe[np.arange(len(rows)), first_negative]]
+            running[rows[has_negative]] = False
+            offset, block = offset + block, block * 2
+
+        cost = total[0::2] + total[1::2] - 3 * (self.cost[swaps[:, 0], swaps[:, 1]] - 1)
+        cost[remove[0::2] | remove[1::2]] = -np.inf
+        return cost
+
+    def check_gate_connectivity(self, act_list: list[int], new_dag: DAGCircuit):
         new_act_list = []
         for act_idx in act_list:
-            node = self.op_gates[act_idx]
-            idx0, idx1 = node.qargs[0]._index, node.qargs[1]._index # original gate index
-            phy0, phy1 = current_layout.get_virtual_bits()[node.qargs[0]], current_layout.get_virtual_bits()[node.qargs[1]]
-            distance = self.coupling_map.distance(phy0, phy1)
+            node = self.gates.op_gates[act_idx]
+            idx0, idx1 = self.gates.gate_qubits[act_idx] # original gate index
+            phy0, phy1 = self.log_to_phy[idx0], self.log_to_phy[idx1]
+            distance = self.distance[phy0, phy1]
             if  distance == 1:
-                self.dlist[idx0].pop(0)
-                self.dlist[idx1].pop(0)
-                node.qargs = (self.cannonical_register[phy0], self.cannonical_register[phy1])
-                new_dag.apply_operation_back(node.op, qargs=node.qargs) # RESOLVED ISSUE HERE, instead of sending gate memory address, send the operation; that is the reason why it yield square box during circuit.draw()
+                self.gates.advance(act_idx)
+                new_dag.apply_operation_back(node.op, qargs=(self.cannonical_register[phy0], self.cannonical_register[phy1])) # RESOLVED ISSUE HERE, instead of sending gate memory address, send the operation; that is the reason why it yield square box during circuit.draw()
                 
             else:
                 new_act_list.append(act_idx)
         return new_act_list, new_dag
 
-    def measure_node(self, node: DAGOpNode, current_layout: Layout, num_clbits) -> DAGOpNode:
-        log0 = current_layout.get_physical_bits()[node.qargs[0]._index]._index
-        classical0 = self.property_set['layout'].get_physical_bits()[log0]._index
-        # check if only available in cargs, because not all are mapped to classical register ex: deutsch-josza mqtbench dj 10
-        if classical0 < num_clbits:
-            node.cargs = (self.meas_register[classical0], )
-        else: # if not mapped to cargs, cast to log0 ?
-            # node.cargs = (self.meas_register[log0], ) # if not mapped to cargs, change to empty
-            log0 = current_layout.get_physical_bits()[classical0]._index
-            classical0 = self.property_set['layout'].get_physical_bits()[log0]._index
-            node.cargs = (self.meas_register[classical0], )
-        return node
+    def route_along_shortest_path(self, act_idx: int, new_dag: DAGCircuit):
+        # escape mode: walk the first qubit of the blocking gate towards the second one along the cheapest path
+        log0, log1 = self.gates.gate_qubits[act_idx]
+        phy0, phy1 = int(self.log_to_phy[log0]), int(self.log_to_phy[log1])
+        if self.distance[phy0, phy1] == 0 and phy0 != phy1: # the distance matrix has 0 for unreachable pairs
+            raise TranspilerError(f"Physical qubits {phy0} and {phy1} are not connected in the coupling map.")
+        while self.distance[phy0, phy1] > 1:
+            neighbors = self.neighbors[phy0]
+            step = neighbors[self.argmax(-np.array([self.cost[phy0, n] + self.cost[n, phy1] for n in neighbors]))]
+            self.apply_swap(phy0, step, new_dag)
+            phy0 = step
 
-    def run(self, dag: DAGCircuit):
+    def argmax(self, values: np.ndarray) -> int:
+        # first maximum, or a random one of the maxima in a seeded run
+        if self.rng is None:
+            return int(np.argmax(values))
+        return int(self.rng.choice(np.flatnonzero(values == values.max())))
 
-        self.dlist = self.list_gates_on_qubit_dag(dag)
-        self.op_gates = self.list_gates(dag)
+    def map_node(self, node: DAGOpNode, new_dag: DAGCircuit):
+        # single-qubit gates, measures and barriers follow their qubits to the current physical position;
+        # the classical bits stay, so a measure still writes the bit of its logical qubit
+        qargs = tuple(self.cannonical_register[self.log_to_phy[qubit._index]] for qubit in node.qargs)
+        new_dag.apply_operation_back(node.op, qargs=qargs, cargs=node.cargs)
 
-        # self.op_gates = list(iter(dag.op_nodes())) # ERROR because layers() is different from serial_layers() order
-        new_dag = dag.copy_empty_like()
+    def run(self, dag: DAGCircuit):
+        router = copy.copy(self) # shares the coupling structure, so one instance can route many circuits at once
+        with self.profiler.span("lookahead_routing"):
+            new_dag = router.route(dag)
+        self.property_set["swap_count"] = router.swap_count
+        # where every wire ended up, so the output knows its permutation (same convention as BasicSwap)
+        final_layout = Layout({router.cannonical_register[wire]: int(phy) for wire, phy in enumerate(router.log_to_phy)})
+        if self.property_set["final_layout"] is None:
+            self.property_set["final_layout"] = final_layout
+        else:
+            self.property_set["final_layout"] = final_layout.compose(self.property_set["final_layout"], dag.qubits)
+        if not isinstance(self.profiler, NullProfiler):
+            self.property_set["profile"] = self.profiler.report()
+        return new_dag
 
+    def route(self, dag: DAGCircuit):
+        profiler = self.profiler
+        new_dag = dag.copy_empty_like()
         self.cannonical_register = dag.qregs['q']
-        if dag.cregs:
-            self.meas_register = dag.cregs['meas'] if 'meas' in dag.cregs else dag.cregs['c']
-        current_layout = Layout.generate_trivial_layout(self.cannonical_register)
-        order = current_layout.reorder_bits(new_dag.qubits)
-        
-        # active gate list per gate, not using greedy algorithm anymore because messed up with indexing
-        curr_idx = 0 # curr_idx variable to count how many operation gate in the circuit
-        is_print_curr_layout = False
-        for layer in dag.layers():
-            self.swap_add = 0
-            subdag = layer['graph']
-            act_list = []
-            # line 15 - 24 initialize first do while with original coupling_map
-            for node in subdag.op_nodes():
-                if node.op.num_qubits == 2: # only check for two-qubit gates, cannot exclude >2 gate because there is barrier
-                    new_act_list, new_dag = self.check_gate_connectivity([curr_idx], new_dag, current_layout)
-                    act_list = act_list + new_act_list
-                else:
-                    if node.name == 'measure': # TODO: handle measure node to conform with curr_layout
-                        # continue
-                        node = self.measure_node(node, current_layout, num_clbits=dag.num_clbits())
-                        
-                    # self.dlist[node.qargs[0]._index].pop(0)
-                    new_dag.apply_operation_back(node.op, qargs=node.qargs, cargs=node.cargs)
-                curr_idx += 1
-            assigned_swap_list = [] # to avoid recursive swap
-            # line 15
-            while act_list: # check if act_list is not empty
-                if self.swap_add > 200: # TODO: to be removed
-                    raise Exception("Swap add timeout.")
-                self.swap_add += 1
-
-                act_list, new_dag = self.check_gate_connectivity(act_list, new_dag, current_layout)
-                
-                candi_list = self.generate_possible_swaps(act_list, self.coupling_map, current_layout, assigned_swap_list)
-                # line 27 - 29
-                MCPE_cost = {}
-                for swap in candi_list:
-                    log0, log1 = current_layout.get_physical_bits()[swap[0]]._index, current_layout.get_physical_bits()[swap[1]]._index
-                    first_total_sum, is_first_remove = self.sum_effect(gate_list=self.dlist[log0], act_list=act_list, swap=swap, coupling_map=self.coupling_map, current_layout=current_layout, str='F')
-                    second_total_sum, is_second_remove = self.sum_effect(self.dlist[log1], act_list, swap, self.coupling_map, current_layout, 'S')
-
-                    if not is_first_remove and not is_second_remove:
-                        MCPE_cost[swap] = first_total_sum + second_total_sum
-
-                # check if MCPE is not empty dict
-                if MCPE_cost:
-                    MCPE_cost = dict(sorted(MCPE_cost.items(), key=lambda item: item[1], reverse=True))
-                    # line 31 update CouplingMap with new SWAP
-                    selected_swap, selected_value = next(iter(MCPE_cost.items())) # GFG take the first next key using next() and iter function is used to get the iterable conversion of dictionary items
-                    if selected_value > 0: # add check only if worth it to do swap, if not will do recursive swap
-                        current_layout.swap(selected_swap[0], selected_swap[1])
-                        # assigned_swap_list.append(selected_swap) # TODO: IS THIS RECURSIVE?
-                        
-                        swap_layer = DAGCircuit()
-                        swap_layer.add_qreg(self.cannonical_register)
-
-                        swap_log0, swap_log1 = current_layout.get_physical_bits()[selected_swap[0]], current_layout.get_physical_bits()[selected_swap[1]]
-
-                        swap_layer.apply_operation_back(SwapGate(), qargs=(swap_log0, swap_log1), cargs=())
-
-                        order = current_layout.reorder_bits(new_dag.qubits)
-                        new_dag.compose(swap_layer, qubits=order)
-        return new_dag
\ No newline at end of file
+        self.log_to_phy = np.arange(dag.num_qubits())
+        self.phy_to_log = np.arange(dag.num_qubits())
+        self.swap_count = 0
+        self.rng = np.random.default_rng(self.seed) if self.seed is not None else None
+
+        if self.window is None:
+            with profiler.span("gate_index"):
+                self.gates = GateIndex(dag)
+            profiler.count("layers", self.gates.num_layers())
+            for layer in range(self.gates.num_layers()):
+                self.route_layer(layer, new_dag)
+        else:
+            # streaming: index 2 * window layers, route the first window of them, drop it and read the next
+            # window, so the index and the lookahead stay the same size however long the circuit is
+            layers = stream_layers(dag)
+            buffer = list(islice(layers, 2 * self.window))
+            while buffer:
+                with profiler.span("gate_index"):
+                    self.gates = GateIndex(dag, buffer)
+                num_routed = min(self.window, len(buffer))
+                profiler.count("windows")
+                profiler.count("layers", num_routed)
+                for layer in range(num_routed):
+                    self.route_layer(layer, new_dag)
+                buffer = buffer[num_routed:] + list(islice(layers, self.window))
+        profiler.count("swaps", self.swap_count)
+        return new_dag
+
+    def route_layer(self, layer: int, new_dag: DAGCircuit):
+        # route the gates of one layer of self.gates, the swaps and gates go straight to new_dag
+        profiler = self.profiler
+        self.swap_add = 0
+        act_list = []
+        # line 15 - 24 initialize first do while with original coupling_map
+        for curr_idx in range(self.gates.layer_ptr[layer], self.gates.layer_ptr[layer + 1]):
+            if self.gates.is_two_qubit[curr_idx]:
+                new_act_list, new_dag = self.check_gate_connectivity([curr_idx], new_dag)
+                act_list = act_list + new_act_list
+            else:
+                self.map_node(self.gates.op_gates[curr_idx], new_dag)
+        assigned_swap_list = [] # to avoid recursive swap
+        stalled = 0 # lookahead swaps since the last routed gate
+        # line 15
+        while act_list: # check if act_list is not empty
+            self.swap_add += 1
+
+            num_waiting = len(act_list)
+            act_list, new_dag = self.check_gate_connectivity(act_list, new_dag)
+            if len(act_list) < num_waiting:
+                stalled = 0
+            if not act_list:
+                break
+
+            candi_list = self.generate_possible_swaps(act_list, assigned_swap_list)
+            # line 27 - 29
+            with profiler.span("mcpe"):
+                MCPE_cost = self.calc_mcpe_cost(candi_list, act_list) if candi_list else np.empty(0)
+            profiler.count("mcpe_candidates", len(candi_list))
+
+            # check if any candidate is left after removing the ones that separate an active gate
+            best = self.argmax(MCPE_cost) if len(MCPE_cost) else -1  # first candidate with the highest cost, same as a stable sort
+            if best >= 0 and MCPE_cost[best] > 0 and stalled < self.stall_limit: # add check only if worth it to do swap, if not will do recursive swap
+                # line 31 update CouplingMap with new SWAP
+                selected_swap = candi_list[best]
+                self.apply_swap(selected_swap[0], selected_swap[1], new_dag)
+                stalled += 1
+                # assigned_swap_list.append(selected_swap) # TODO: IS THIS RECURSIVE?
+            else:
+                # lookahead has no useful swap or keeps moving without routing anything:
+                # bring the first blocked gate together, then continue with lookahead
+                swaps_before = self.swap_count
+                with profiler.span("escape"):
+                    self.route_along_shortest_path(act_list[0], new_dag)
+                profiler.count("escape_swaps", self.swap_count - swaps_before)
+                stalled = 0
+        profiler.count("iterations", self.swap_add)
+        profiler.maximum("max_layer_iterations", self.swap_add)
@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from qiskit import QuantumCircuit
+from qiskit.transpiler import CouplingMap, StagedPassManager
+
+from lib.distributed_coupling_map import DistributedTopology
+from lib.layout_cache import LayoutCache
+from lib.transpiler_plugins import interaction_layout_stage, lookahead_routing_stage
+from lib.timer_helper import NULL_PROFILER, Profiler, Timer
+
+"""
+Multi-trial layout and routing: InteractionMapping and DynamicLookaheadSwap are run with differently seeded
+tie-breaking on a process pool and the best routed circuit is kept, like the parallel trials of Sabre.
+
+Trial 0 is the deterministic run (first candidate on every tie), trial t > 0 uses seed + t in both stages, so
+the result is never worse than a single run and the same arguments always give the same circuit. With at
+least as many workers as trials the wall time is one trial plus the pool overhead:
+
+    best = run_trials(qc, topology, trials=8)
+    best["circuit"], best["swap"], best["seed"]
+"""
+
+OBJECTIVES = {
+    "swap": lambda trial: (trial["swap"], trial["depth"]),
+    "depth": lambda trial: (trial["depth"], trial["swap"]),
+}
+
+def trial_seeds(trials: int, seed: int = 0) -> list[int | None]:
+    return [None] + [seed + trial for trial in range(1, trials)]
+
+def route_trial(qc: QuantumCircuit, coupling_map: CouplingMap | DistributedTopology, seed: int | None = None,
+                mapping_options: dict | None = None, stall_limit: int | None = None, window: int | None = None,
+                initial_map=None, layout_cache: LayoutCache | None = None, interactions=None, profile: bool = False) -> dict:
+    # one layout + routing run, the routed circuit still has its SWAP gates; the deterministic trial keeps
+    # the mapping options as given, so it shares its layout cache entry with a single run
+    mapping_options = dict(mapping_options or {}) if seed is None else dict(mapping_options or {}, seed=seed)
+    profiler = Profiler() if profile else NULL_PROFILER
+    pass_manager = StagedPassManager()
+    pass_manager.layout = interaction_layout_stage(coupling_map, initial_map, mapping_options, profiler, layout_cache, interactions)
+    pass_manager.routing = lookahead_routing_stage(coupling_map, stall_limit, profiler, window=window, seed=seed)
+    with Timer() as t:
+        routed = pass_manager.run(qc)
+    return {"seed": seed, "circuit": routed, "swap": routed.count_ops().get("swap", 0), "depth": routed.depth(),
+            "interval": t.interval, "profile": profiler.report() if profile else None}
+
+def run_trials(
+    qc: QuantumCircuit, coupling_map: CouplingMap | DistributedTopology, trials: int = 8, workers: int | None = None,
+    objective: str = "swap", seed: int = 0, mapping_options: dict | None = None, stall_limit: int | None = None,
+    window: int | None = None, initial_map=None, layout_cache: LayoutCache | None = None, interactions=None,
+    profiler: Profiler = NULL_PROFILER,
+) -> dict:
+    """Best of `trials` seeded runs by `objective` ("swap": fewest swaps then lowest depth, "depth": the reverse).
+
+    Returns the record of the best trial (seed, circuit, swap, depth, interval) together with the swap and
+    depth of every trial. workers=1 runs the trials one after another in this process, e.g. inside a worker
+    of lib/benchmark_runner.py; workers=None uses one process per trial up to the number of CPUs.
+    initial_map, layout_cache and interactions go to the layout stage of every trial like in
+    build_pass_manager(). Every trial records into its own profiler and the reports of all trials are merged
+    into `profiler`; on a process pool every worker has its own copy of layout_cache, so only its directory
+    tier is shared.
+    """
+    key = OBJECTIVES[objective]
+    seeds = trial_seeds(trials, seed)
+    workers = min(workers or os.cpu_count() or 1, trials)
+    options = {
+        "mapping_options": mapping_options, "stall_limit": stall_limit, "window": window, "initial_map": initial_map,
+        "layout_cache": layout_cache, "interactions": interactions, "profile": profiler is not NULL_PROFILER,
+    }
+    if workers == 1:
+        results = [route_trial(qc, coupling_map, trial_seed, **options) for trial_seed in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(route_trial, qc, coupling_map, trial_seed, **options) for trial_seed in seeds]
+            results = [future.result() for future in futures]
+    for trial in results:
+        if trial["profile"] is not None:
+            profiler.merge(trial["profile"])
+    profiler.count("trials", len(results))
+    # ties keep the earlier trial, so the choice does not depend on which process finishes first
+    best = min(results, key=key)
+    return dict(best, trial_swaps=[trial["swap"] for trial in results], trial_depths=[trial["depth"] for trial in results])
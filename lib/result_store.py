@@ -0,0 +1,105 @@
+import json
+import os
+from typing import Iterator
+
+"""
+Append-only benchmark results in JSON Lines: one flat record per (circuit_size, benchmark, layout, routing).
+
+Appending a result writes a single line (one write call on an O_APPEND file, then fsync), so a crash can
+at most leave a partial last line, which the loader skips. to_nested_dict() rebuilds the tree of
+result/benchmarking_FINAL.json for 6_table_plot.ipynb and import_nested_dict() turns such a tree into
+records, so a sweep saved by 5_benchmarking.ipynb can seed the store.
+
+Filtered reads still scan the whole file, they only skip json.loads for lines that cannot match. There is
+no key -> offset index next to the file: several runner workers append at the same time and an index
+would need its own locking to stay in step with the lines, while a full sweep is a few thousand lines.
+"""
+
+RESULT_STORE_FILE = "result/benchmarking.jsonl"
+KEY_FIELDS = ("circuit_size", "benchmark", "layout", "routing")
+
+class ResultStore:
+    def __init__(self, filename: str = RESULT_STORE_FILE):
+        self.filename = filename
+
+    def append(self, record: dict):
+        missing = [field for field in KEY_FIELDS if field not in record]
+        if missing:
+            raise ValueError(f"Result record is missing {missing}.")
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        fd = os.open(self.filename, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if self._ends_without_newline(fd):
+                line = "\n" + line  # isolate a partial line left by a crash
+            os.write(fd, line.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _ends_without_newline(self, fd) -> bool:
+        size = os.fstat(fd).st_size
+        return size > 0 and os.pread(fd, 1, size - 1) != b"\n"
+
+    def iter_records(self, **filters) -> Iterator[dict]:
+        # streams the whole file; a line is only parsed if every filter value appears in it as a substring
+        if not os.path.exists(self.filename):
+            return
+        needles = [json.dumps(value) for value in filters.values()]
+        with open(self.filename) as result_file:
+            for line in result_file:
+                if not line.endswith("\n") or not all(needle in line for needle in needles):
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial line from an interrupted write
+                if all(record.get(field) == value for field, value in filters.items()):
+                    yield record
+
+    def load(self, **filters) -> list[dict]:
+        return list(self.iter_records(**filters))
+
+    def completed_keys(self) -> set[tuple]:
+        return {tuple(record[field] for field in KEY_FIELDS) for record in self.iter_records()}
+
+    def to_nested_dict(self, **filters) -> dict:
+        # circuit_size -> benchmark -> 'init' | layout -> '{routing}_{metric}', later records win
+        dict_benchmark = {}
+        for record in self.iter_records(**filters):
+            benchmark = dict_benchmark.setdefault(str(record["circuit_size"]), {}).setdefault(record["benchmark"], {"init": {}})
+            layout = benchmark.setdefault(record["layout"], {})
+            for field, value in record.items():
+                if field in KEY_FIELDS:
+                    continue
+                if field.startswith("init_"):
+                    benchmark["init"][field.removeprefix("init_")] = value
+                else:
+                    layout[f'{record["routing"]}_{field}'] = value
+        return dict_benchmark
+
+    def import_nested_dict(self, dict_benchmark: dict) -> int:
+        # inverse of to_nested_dict(): appends one record per cell of the tree that is not in the store yet
+        # and returns the number of appended records; cells without swap_gates get it from swap
+        completed = self.completed_keys()
+        imported = 0
+        for circuit_size, benchmarks in dict_benchmark.items():
+            for benchmark_name, layouts in benchmarks.items():
+                init = {f"init_{field}": value for field, value in layouts.get("init", {}).items()}
+                for layout, metrics in layouts.items():
+                    if layout == "init":
+                        continue
+                    records = {}  # routing -> record, fields are '{routing}_{metric}'
+                    for field, value in metrics.items():
+                        routing, metric = field.split("_", 1)
+                        record = records.setdefault(routing, {"circuit_size": int(circuit_size), "benchmark": benchmark_name, "layout": layout, "routing": routing})
+                        record[metric] = value
+                    for record in records.values():
+                        if tuple(record[field] for field in KEY_FIELDS) in completed:
+                            continue
+                        if "swap" in record and "swap_gates" not in record:
+                            # legacy trees only have the CX estimate (3 per SWAP), swap keeps that unit
+                            record["swap_gates"] = record["swap"] // 3
+                        self.append(dict(record, **init))
+                        imported += 1
+        return imported
@@ -0,0 +1,163 @@
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import UGate
+from qiskit.exceptions import QiskitError
+from qiskit.quantum_info import Clifford, Operator, Statevector
+from qiskit.transpiler import CouplingMap
+
+"""
+Exact equivalence check of a routed circuit against its original, instead of comparing sampled counts.
+
+The routed circuit is turned back into a circuit on the wires it started on: SWAP gates are followed and
+dropped (or, when the circuit carries a final layout, the routing permutation is undone at the end). The
+original is placed on the initial physical qubits and both are reduced to the qubits they touch. They are
+then compared with stabilizer tableaux when both are Clifford, as unitaries up to max_operator_qubits and
+on num_states random product states up to max_statevector_qubits (two different unitaries agree on a random
+input state with probability zero), all up to a global phase:
+
+    result = validate_routing(qc, routed, initial_layout=best_layout, coupling_map=topology.coupling_map)
+    result["equivalent"], result["method"]
+"""
+
+def initial_physical_qubits(routed: QuantumCircuit, initial_layout=None, num_logical: int | None = None) -> list[int]:
+    # physical qubit of every logical qubit, from a [(logical, physical)] map (InteractionLayout), a list of
+    # physical qubits, or the TranspileLayout of the routed circuit
+    if initial_layout is None:
+        if routed.layout is None:
+            return list(range(num_logical))
+        return routed.layout.initial_index_layout(filter_ancillas=True)
+    initial_layout = list(initial_layout)
+    if initial_layout and isinstance(initial_layout[0], (tuple, list)):
+        physical = dict((int(logical), int(phy)) for logical, phy in initial_layout)
+        return [physical[logical] for logical in range(len(physical))]
+    return [int(phy) for phy in initial_layout]
+
+def permutation_swaps(final_permutation) -> list[tuple]:
+    # SWAPs that move the wire sitting on final_permutation[q] back to q, for every q
+    occupant = {int(phy): wire for wire, phy in enumerate(final_permutation)}  # physical qubit -> wire on it
+    position = {wire: phy for phy, wire in occupant.items()}
+    swaps = []
+    for wire in range(len(final_permutation)):
+        phy = position[wire]
+        if phy != wire:
+            other = occupant[wire]
+            swaps.append((wire, phy))
+            occupant[wire], occupant[phy] = wire, other
+            position[wire], position[other] = wire, phy
+    return swaps
+
+def unrouted_circuit(routed: QuantumCircuit, final_permutation=None) -> QuantumCircuit | None:
+    """The routed circuit on its starting wires: qubit q of the result is the wire that started on physical q.
+
+    Without final_permutation the SWAP gates are followed and left out, with it they stay as gates and the
+    permutation (final_permutation[q] = where the wire of q ended) is undone by SWAPs at the end. None if
+    the circuit has operations that are not unitary (measurements in the middle, resets, conditions).
+    """
+    routed = routed.remove_final_measurements(inplace=False)
+    wire_at = list(range(routed.num_qubits))  # wire_at[phy] = starting qubit of the wire now on phy
+    circuit = QuantumCircuit(routed.num_qubits, global_phase=routed.global_phase)
+    for instruction in routed.data:
+        operation = instruction.operation
+        if operation.name == "barrier":
+            continue
+        if instruction.clbits or operation.name in ("measure", "reset", "delay"):
+            return None
+        qubits = [routed.find_bit(qubit).index for qubit in instruction.qubits]
+        if final_permutation is None and operation.name == "swap":
+            phy0, phy1 = qubits
+            wire_at[phy0], wire_at[phy1] = wire_at[phy1], wire_at[phy0]
+            continue
+        circuit.append(operation, [wire_at[qubit] for qubit in qubits])
+    if final_permutation is not None:
+        for phy0, phy1 in permutation_swaps(final_permutation):
+            circuit.swap(phy0, phy1)
+    return circuit
+
+def placed_circuit(original: QuantumCircuit, physical: list[int], num_physical: int) -> QuantumCircuit | None:
+    # the original circuit with logical qubit q on physical[q], None if it is not unitary
+    original = original.remove_final_measurements(inplace=False)
+    circuit = QuantumCircuit(num_physical, global_phase=original.global_phase)
+    for instruction in original.data:
+        if instruction.operation.name == "barrier":
+            continue
+        if instruction.clbits or instruction.operation.name in ("measure", "reset", "delay"):
+            return None
+        circuit.append(instruction.operation, [physical[original.find_bit(qubit).index] for qubit in instruction.qubits])
+    return circuit
+
+def _reduce(circuits: list[QuantumCircuit]) -> list[QuantumCircuit]:
+    # same circuits on only the qubits that any of them acts on
+    used = sorted({circuit.find_bit(qubit).index for circuit in circuits for instruction in circuit.data for qubit in instruction.qubits})
+    index = {qubit: position for position, qubit in enumerate(used)}
+    reduced = []
+    for circuit in circuits:
+        new_circuit = QuantumCircuit(len(used), global_phase=circuit.global_phase)
+        for instruction in circuit.data:
+            new_circuit.append(instruction.operation, [index[circuit.find_bit(qubit).index] for qubit in instruction.qubits])
+        reduced.append(new_circuit)
+    return reduced
+
+def _clifford(circuit: QuantumCircuit) -> Clifford | None:
+    try:
+        return Clifford(circuit)
+    except (QiskitError, TypeError):
+        return None
+
+def _product_state_equivalent(actual: QuantumCircuit, expected: QuantumCircuit, num_states: int, seed: int) -> bool:
+    # both circuits on the same random single-qubit input states
+    rng = np.random.default_rng(seed)
+    for _ in range(num_states):
+        prepare = QuantumCircuit(actual.num_qubits)
+        for qubit, angles in enumerate(rng.uniform(0, 2 * np.pi, size=(actual.num_qubits, 3)).tolist()):
+            prepare.append(UGate(*angles), [qubit])
+        if not Statevector(prepare.compose(actual)).equiv(Statevector(prepare.compose(expected))):
+            return False
+    return True
+
+def is_connected(routed: QuantumCircuit, coupling_map: CouplingMap) -> bool:
+    # every two-qubit gate of the routed circuit sits on a coupler (either direction)
+    edges = set(map(tuple, coupling_map.get_edges()))
+    for instruction in routed.data:
+        if len(instruction.qubits) == 2 and instruction.operation.name != "barrier":
+            pair = tuple(routed.find_bit(qubit).index for qubit in instruction.qubits)
+            if pair not in edges and pair[::-1] not in edges:
+                return False
+    return True
+
+def validate_routing(
+    original: QuantumCircuit, routed: QuantumCircuit, initial_layout=None, final_permutation=None,
+    coupling_map: CouplingMap | None = None, max_operator_qubits: int = 6, max_statevector_qubits: int = 20,
+    num_states: int = 2, seed: int = 0,
+) -> dict:
+    """Check that `routed` implements `original` placed with `initial_layout`.
+
+    initial_layout defaults to the TranspileLayout of `routed`; final_permutation defaults to its routing
+    permutation and, without a final layout, to following the SWAP gates (e.g. the DAG returned by
+    DynamicLookaheadSwap, skipped when the original has SWAP gates of its own). Returns equivalent (True,
+    False or None when not checked), the method used ("clifford", "operator", "statevector" or "skipped"),
+    the number of compared qubits and, with a coupling map, whether every two-qubit gate is on a coupler.
+    """
+    if final_permutation is None and routed.layout is not None and routed.layout.final_layout is not None:
+        final_permutation = routed.layout.routing_permutation()
+    physical = initial_physical_qubits(routed, initial_layout, original.num_qubits)
+    actual = unrouted_circuit(routed, final_permutation)
+    expected = placed_circuit(original, physical, routed.num_qubits)
+    result = {"equivalent": None, "method": "skipped", "qubits": 0}
+    if coupling_map is not None:
+        result["connected"] = is_connected(routed, coupling_map)
+    if actual is None or expected is None:
+        return result
+    if final_permutation is None and "swap" in original.count_ops():
+        return result  # the inserted SWAPs cannot be told apart from the ones of the circuit
+
+    actual, expected = _reduce([actual, expected])
+    result["qubits"] = actual.num_qubits
+    clifford_actual = _clifford(actual)
+    clifford_expected = _clifford(expected) if clifford_actual is not None else None
+    if clifford_expected is not None:
+        result.update(equivalent=bool(clifford_actual == clifford_expected), method="clifford")
+    elif actual.num_qubits <= max_operator_qubits:
+        result.update(equivalent=bool(Operator(actual).equiv(Operator(expected))), method="operator")
+    elif actual.num_qubits <= max_statevector_qubits:
+        result.update(equivalent=_product_state_equivalent(actual, expected, num_states, seed), method="statevector")
+    return result
@@ -0,0 +1,187 @@
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+import rustworkx as rx
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+
+from lib.benchmark_helper import SwapCounter, build_pass_manager, layout_key
+from lib.distributed_coupling_map import REMOTE_LINK_WEIGHT, distributed_topology
+from lib.hierarchical_mapping import build_mapping
+from lib.result_store import ResultStore
+from lib.timer_helper import Profiler, Timer
+
+"""
+Offline scaling benchmark: seeded synthetic circuits (random, QFT-like, QAOA-like) from 10 to 500 qubits on
+every layout family of lib/distributed_coupling_map.py, mapped with InteractionMapping (or HierarchicalMapping with
+--hierarchical) and routed with
+DynamicLookaheadSwap. Mapping and routing are timed separately and --memory repeats every cell under
+tracemalloc for the memory peak of each phase. Every run is appended to a JSON Lines result store together
+with the git commit, and scaling_exponents() fits interval ~ num_qubits^k per (pattern, layout) so two
+commits can be compared:
+
+    python -m lib.scaling_benchmark --sizes 10 20 50 100 200 500 --memory --output result/scaling.jsonl
+    python -m lib.scaling_benchmark --report result/scaling.jsonl
+"""
+
+SCALING_RESULT_FILE = "result/scaling.jsonl"
+SCALING_SIZES = [10, 20, 50, 100, 200, 500]
+PATTERNS = ["random", "qft_like", "qaoa_like"]
+# qubits per group of every layout family, the number of groups grows with the circuit
+GROUP_SIZES = {"full": 10, "line": 10, "ring": 10, "grid": 9, "t_horizontal": 5, "t_vertical": 5}
+
+def random_circuit(num_qubits: int, seed: int, gates_per_qubit: int = 10) -> QuantumCircuit:
+    # uniformly random CX pairs with a single-qubit rotation in between
+    rng = np.random.default_rng(seed)
+    qc = QuantumCircuit(num_qubits)
+    for _ in range(gates_per_qubit * num_qubits):
+        qubit0, qubit1 = rng.choice(num_qubits, size=2, replace=False).tolist()
+        qc.rz(float(rng.random()), qubit0)
+        qc.cx(qubit0, qubit1)
+    return qc
+
+def qft_like_circuit(num_qubits: int, seed: int, approximation: int | None = None) -> QuantumCircuit:
+    # approximate QFT: controlled phases only between qubits at most `approximation` apart (default log2 n)
+    approximation = approximation or max(1, math.ceil(math.log2(num_qubits)))
+    qc = QuantumCircuit(num_qubits)
+    for target in range(num_qubits):
+        qc.h(target)
+        for control in range(target + 1, min(num_qubits, target + approximation + 1)):
+            qc.cp(math.pi / 2 ** (control - target), control, target)
+    return qc
+
+def qaoa_like_circuit(num_qubits: int, seed: int, layers: int = 2, degree: int = 3) -> QuantumCircuit:
+    # QAOA on a seeded random graph with num_qubits * degree / 2 edges: RZZ per edge, then an RX mixer
+    graph = rx.undirected_gnm_random_graph(num_qubits, num_qubits * degree // 2, seed=seed)
+    rng = np.random.default_rng(seed)
+    qc = QuantumCircuit(num_qubits)
+    qc.h(range(num_qubits))
+    for _ in range(layers):
+        gamma, beta = rng.random(2).tolist()
+        for qubit0, qubit1 in graph.edge_list():
+            qc.rzz(gamma, qubit0, qubit1)
+        qc.rx(beta, range(num_qubits))
+    return qc
+
+CIRCUIT_GENERATORS = {"random": random_circuit, "qft_like": qft_like_circuit, "qaoa_like": qaoa_like_circuit}
+
+def git_commit() -> str | None:
+    # commit of the checkout this module lives in, whatever the working directory of the run
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.run(["git", "-C", repository, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def map_and_route(topology, qc: QuantumCircuit, dag, mapping_options=None, trace_memory: bool = False) -> dict:
+    # one mapping + routing run; with trace_memory only the tracemalloc peaks are meaningful, not the intervals
+    result = {}
+    if trace_memory:
+        tracemalloc.start()
+    with Timer() as mapping_timer:
+        mapping = build_mapping(topology, dag, **(mapping_options or {}))
+        best_layout = mapping.get_best_qpi_layout()
+    if trace_memory:
+        result["mapping_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+    profiler = Profiler()
+    swaps = SwapCounter(topology)
+    with Timer() as transpile_timer:
+        pm = build_pass_manager("lookahead", topology.backend, best_layout, topology, profiler)
+        isa = pm.run(qc, callback=swaps)
+    if trace_memory:
+        result["routing_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    return {
+        "mapping_interval": mapping_timer.interval,
+        "routing_interval": profiler.spans.get("lookahead_routing", 0.0),
+        "transpile_interval": transpile_timer.interval,
+        "swap": swaps.swap, "remote_swap": swaps.remote_swap,
+        "size": isa.size(), "depth": isa.depth(),
+        "mapping_deadline_reached": mapping.deadline_reached,
+    }
+
+def run_scaling_cell(pattern: str, num_qubits: int, layout_name: str, seed: int = 0, mapping_options=None,
+                     remote_weight: float = REMOTE_LINK_WEIGHT, trace_memory: bool = False) -> dict:
+    group_size = GROUP_SIZES[layout_name]
+    num_group = max(2, math.ceil(num_qubits / group_size))
+    topology = distributed_topology(layout_name, group_size, num_group, remote_weight)
+    qc = CIRCUIT_GENERATORS[pattern](num_qubits, seed)
+    dag = circuit_to_dag(qc)
+    record = {
+        "circuit_size": num_qubits, "benchmark": pattern,
+        "layout": layout_key(layout_name, group_size, num_group), "routing": "lookahead",
+        "seed": seed, "physical_qubits": topology.size, "two_qubit_gates": len(dag.two_qubit_ops()),
+    }
+    record.update(map_and_route(topology, qc, dag, mapping_options))
+    if trace_memory:
+        # second run under tracemalloc, which slows Python code down several times and would distort the timings
+        record.update(map_and_route(topology, qc, dag, mapping_options, trace_memory=True))
+    return record
+
+def run_scaling_benchmark(sizes=SCALING_SIZES, patterns=PATTERNS, layouts=tuple(GROUP_SIZES), seed: int = 0,
+                          filename: str = SCALING_RESULT_FILE, mapping_options=None, trace_memory: bool = False):
+    store = ResultStore(filename)
+    commit = git_commit()
+    for num_qubits in sizes:
+        for pattern in patterns:
+            for layout_name in layouts:
+                record = run_scaling_cell(pattern, num_qubits, layout_name, seed, mapping_options, trace_memory=trace_memory)
+                record["commit"] = commit
+                record["mapping_options"] = mapping_options
+                store.append(record)
+                print(num_qubits, pattern, record["layout"], f'{record["mapping_interval"]:.3f}s', f'{record["routing_interval"]:.3f}s', file=sys.stderr)
+    return store
+
+def scaling_exponents(records, metric: str = "routing_interval") -> dict:
+    # least squares slope of log(metric) over log(num_qubits) per (commit, pattern, layout family)
+    points = {}
+    for record in records:
+        if record.get(metric, 0) > 0:
+            family = record["layout"].rsplit("_", 2)[0]
+            points.setdefault((record.get("commit"), record["benchmark"], family), []).append((record["circuit_size"], record[metric]))
+    exponents = {}
+    for key, values in points.items():
+        sizes, metric_values = np.array(values, dtype=float).T
+        if len(np.unique(sizes)) >= 2:
+            exponents[key] = float(np.polyfit(np.log(sizes), np.log(metric_values), 1)[0])
+    return exponents
+
+def print_exponents(filename: str):
+    records = ResultStore(filename).load()
+    for metric in ("mapping_interval", "routing_interval", "mapping_peak_bytes", "routing_peak_bytes"):
+        for (commit, pattern, family), exponent in sorted(scaling_exponents(records, metric).items(), key=str):
+            print(f"{metric:20} {commit or '-':10} {pattern:10} {family:13} n^{exponent:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scaling benchmark of the interaction mapping and lookahead routing.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SCALING_SIZES)
+    parser.add_argument("--patterns", nargs="+", default=PATTERNS, choices=PATTERNS)
+    parser.add_argument("--layouts", nargs="+", default=list(GROUP_SIZES), choices=list(GROUP_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=SCALING_RESULT_FILE)
+    parser.add_argument("--beam-width", type=int, default=8, help="InteractionMapping beam width")
+    parser.add_argument("--deadline", type=float, default=None, help="InteractionMapping deadline in seconds")
+    parser.add_argument("--hierarchical", action="store_true", help="partition-first mapping (lib/hierarchical_mapping.py)")
+    parser.add_argument("--memory", action="store_true", help="repeat every cell under tracemalloc to record the memory peaks")
+    parser.add_argument("--report", metavar="FILE", help="only print the scaling exponents of an existing result file")
+    args = parser.parse_args(argv)
+
+    if args.report:
+        print_exponents(args.report)
+        return
+    mapping_options = {"beam_width": args.beam_width, "deadline": args.deadline}
+    if args.hierarchical:
+        mapping_options["hierarchical"] = True
+    run_scaling_benchmark(args.sizes, args.patterns, args.layouts, args.seed, args.output, mapping_options, args.memory)
+    print_exponents(args.output)
+
+if __name__ == "__main__":
+    main()
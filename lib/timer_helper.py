@@ -1,11 +1,70 @@
 import time
+from contextlib import contextmanager, nullcontext
 
 # Time interval class
-class Timer:    
+class Timer:
     def __enter__(self):
-        self.start = time.time()
+        self.start = time.perf_counter()
         return self
 
     def __exit__(self, *args):
-        self.end = time.time()
-        self.interval = self.end - self.start
\ No newline at end of file
+        self.end = time.perf_counter()
+        self.interval = self.end - self.start
+
+# Opt-in instrumentation: nested perf_counter spans ("outer/inner" -> seconds, calls) and named counters
+class Profiler:
+    def __init__(self):
+        self.spans = {}
+        self.calls = {}
+        self.counters = {}
+        self._stack = []
+
+    @contextmanager
+    def span(self, name: str):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.spans[path] = self.spans.get(path, 0.0) + time.perf_counter() - start
+            self.calls[path] = self.calls.get(path, 0) + 1
+            self._stack.pop()
+
+    def count(self, name: str, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def maximum(self, name: str, value):
+        self.counters[name] = max(self.counters.get(name, value), value)
+
+    def report(self) -> dict:
+        return {"spans": dict(self.spans), "calls": dict(self.calls), "counters": dict(self.counters)}
+
+    def merge(self, report: dict):
+        # add the report of another profiler (e.g. of a worker process) below the spans open here;
+        # counters named max_* were recorded with maximum(), the others add up
+        prefix = "".join(f"{name}/" for name in self._stack)
+        for path, seconds in report["spans"].items():
+            self.spans[prefix + path] = self.spans.get(prefix + path, 0.0) + seconds
+            self.calls[prefix + path] = self.calls.get(prefix + path, 0) + report["calls"].get(path, 0)
+        for name, value in report["counters"].items():
+            if name.startswith("max_"):
+                self.maximum(name, value)
+            else:
+                self.count(name, value)
+
+# Default of the mapping and routing code: same interface, records nothing
+class NullProfiler(Profiler):
+    def span(self, name: str):
+        return nullcontext(self)
+
+    def count(self, name: str, value=1):
+        pass
+
+    def maximum(self, name: str, value):
+        pass
+
+    def merge(self, report: dict):
+        pass
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,79 @@
+import numpy as np
+from qiskit.providers import Backend
+from qiskit.transpiler import CouplingMap, PassManager, StagedPassManager
+from qiskit.transpiler.passes import SetLayout
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit.transpiler.preset_passmanagers.common import generate_embed_passmanager, generate_routing_passmanager
+from qiskit.transpiler.preset_passmanagers.plugin import PassManagerStagePlugin
+from qiskit.transpiler.target import Target
+
+from lib.distributed_coupling_map import DistributedTopology
+from lib.interaction_layout import InteractionLayout
+from lib.layout_cache import LayoutCache
+from lib.lookahead_routing import DynamicLookaheadSwap
+from lib.timer_helper import NULL_PROFILER, Profiler
+
+"""
+InteractionLayout (mapping computed inside the layout stage) and DynamicLookaheadSwap as transpiler stage plugins.
+
+Qiskit finds stage plugins through entry points, so a project that installs lib/ registers them with
+    [project.entry-points."qiskit.transpiler.layout"]
+    interaction = "lib.transpiler_plugins:InteractionLayoutPlugin"
+    [project.entry-points."qiskit.transpiler.routing"]
+    lookahead = "lib.transpiler_plugins:LookaheadRoutingPlugin"
+and then uses generate_preset_pass_manager(layout_method="interaction", routing_method="lookahead").
+Without installing, generate_interaction_pass_manager() swaps the same stages into a preset pass manager.
+Both passes keep no per-run state, so pm.run([...]) compiles a batch in parallel against one backend.
+"""
+
+def _plain_coupling_map(coupling_map: CouplingMap | Target | DistributedTopology) -> CouplingMap:
+    if isinstance(coupling_map, Target):
+        return coupling_map.build_coupling_map()
+    if isinstance(coupling_map, DistributedTopology):
+        return coupling_map.coupling_map
+    return coupling_map
+
+def interaction_layout_stage(
+    coupling_map: CouplingMap | Target | DistributedTopology, initial_map: list[tuple] | None = None,
+    mapping_options: dict | None = None, profiler: Profiler = NULL_PROFILER, layout_cache: LayoutCache | None = None,
+    interactions: np.ndarray | None = None,
+) -> PassManager:
+    # layout + embed: InteractionMapping runs per circuit (or is looked up in layout_cache) unless initial_map is given
+    if interactions is not None:
+        interactions = tuple(map(tuple, np.asarray(interactions).reshape(-1, 2).tolist()))
+    layout = PassManager(InteractionLayout(coupling_map, initial_map, profiler=profiler, mapping_options=mapping_options, layout_cache=layout_cache, interactions=interactions))
+    layout += generate_embed_passmanager(_plain_coupling_map(coupling_map))
+    return layout
+
+def lookahead_routing_stage(
+    coupling_map: CouplingMap | Target | DistributedTopology, stall_limit: int | None = None,
+    profiler: Profiler = NULL_PROFILER, window: int | None = None, seed: int | None = None,
+) -> PassManager:
+    target = coupling_map if isinstance(coupling_map, Target) else _plain_coupling_map(coupling_map)
+    return generate_routing_passmanager(DynamicLookaheadSwap(coupling_map, stall_limit, profiler, window, seed), target=target)
+
+class InteractionLayoutPlugin(PassManagerStagePlugin):
+    def pass_manager(self, pass_manager_config, optimization_level=None) -> PassManager:
+        coupling_map = pass_manager_config.target or pass_manager_config.coupling_map
+        if pass_manager_config.initial_layout is not None: # a user layout wins, like the default layout stage
+            layout = PassManager(SetLayout(pass_manager_config.initial_layout))
+            layout += generate_embed_passmanager(_plain_coupling_map(coupling_map))
+            return layout
+        return interaction_layout_stage(coupling_map)
+
+class LookaheadRoutingPlugin(PassManagerStagePlugin):
+    def pass_manager(self, pass_manager_config, optimization_level=None) -> PassManager:
+        return lookahead_routing_stage(pass_manager_config.target or pass_manager_config.coupling_map)
+
+def generate_interaction_pass_manager(
+    backend: Backend, optimization_level: int = 0, topology: DistributedTopology | None = None,
+    initial_map: list[tuple] | None = None, mapping_options: dict | None = None, stall_limit: int | None = None,
+    profiler: Profiler = NULL_PROFILER, window: int | None = None, layout_cache: LayoutCache | None = None, **preset_options,
+) -> StagedPassManager:
+    # preset pass manager of the backend with the interaction layout and lookahead routing stages,
+    # a DistributedTopology of the backend adds its remote link weights to both
+    pass_manager = generate_preset_pass_manager(optimization_level, backend=backend, **preset_options)
+    coupling_map = topology or backend.target
+    pass_manager.layout = interaction_layout_stage(coupling_map, initial_map, mapping_options, profiler, layout_cache)
+    pass_manager.routing = lookahead_routing_stage(coupling_map, stall_limit, profiler, window)
+    return pass_manager
@@ -0,0 +1,38 @@
+import os
+import random
+import sys
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+
+# the notebooks import the modules as lib.<module> from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.distributed_coupling_map import distributed_topology  # noqa: E402
+from lib.interaction_mapping import InteractionMapping  # noqa: E402
+from lib.lookahead_routing import DynamicLookaheadSwap  # noqa: E402
+from lib.routing_validation import placed_circuit  # noqa: E402
+
+def random_circuit(num_qubits: int, num_gates: int, seed: int) -> QuantumCircuit:
+    # CX gates between random pairs with some RZ rotations in between
+    rnd = random.Random(seed)
+    qc = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        if rnd.random() < 0.3:
+            qc.rz(rnd.random(), rnd.randrange(num_qubits))
+        qubit0, qubit1 = rnd.sample(range(num_qubits), 2)
+        qc.cx(qubit0, qubit1)
+    return qc
+
+def route_circuit(circuit: QuantumCircuit, window: int | None = None, **routing_options):
+    # InteractionMapping layout, then DynamicLookaheadSwap on the circuit placed on the physical qubits
+    topology = distributed_topology("grid", 9, 2)
+    initial_map = InteractionMapping(topology, circuit_to_dag(circuit), beam_width=8).get_best_qpi_layout()
+    physical = dict(initial_map)
+    placed = placed_circuit(circuit, [physical[logical] for logical in range(circuit.num_qubits)], topology.size)
+    routed = DynamicLookaheadSwap(topology, window=window, **routing_options).run(circuit_to_dag(placed))
+    return dag_to_circuit(routed), initial_map
+
+@pytest.fixture
+def circuit():
+    return random_circuit(10, 80, seed=1)
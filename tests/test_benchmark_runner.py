@@ -0,0 +1,8 @@
+from lib.benchmark_runner import pending_tasks
+
+def test_pending_cells_are_grouped_by_circuit():
+    completed = {(5, "ghz", "grid_9_2", "basic")}
+    tasks = pending_tasks(completed, [5, 10], ["ghz", "qft"], [["grid", 9, 2], ["ring", 7, 3]], ["basic", "sabre"])
+    assert [(circuit_size, benchmark_name) for circuit_size, benchmark_name, _ in tasks] == [(10, "ghz"), (10, "qft"), (5, "ghz"), (5, "qft")]
+    assert tasks[2][2] == [("grid", 9, 2, "sabre"), ("ring", 7, 3, "basic"), ("ring", 7, 3, "sabre")]
+    assert pending_tasks(completed, [5], ["ghz"], [["grid", 9, 2]], ["basic"]) == []
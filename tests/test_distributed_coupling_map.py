@@ -0,0 +1,10 @@
+import numpy as np
+
+from lib.distributed_coupling_map import DistributedTopology
+
+def test_cost_matrix_weights_remote_links():
+    uniform = DistributedTopology("ring", 7, 3, remote_weight=1.0)
+    assert np.array_equal(uniform.cost_matrix, uniform.distance_matrix)
+    topology = DistributedTopology("line", 3, 2, remote_weight=10.0)  # 0 - 1 - 2 = 3 - 4 - 5
+    assert topology.cost_matrix[0, 5] == 14.0
+    assert np.array_equal(topology.cost_matrix, topology.cost_matrix.T)
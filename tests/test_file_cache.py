@@ -0,0 +1,26 @@
+import os
+import numpy as np
+from qiskit import QuantumCircuit
+
+from lib.circuit_cache import CircuitCache
+from lib.file_cache import trim_directory, write_atomic
+
+def test_trim_removes_least_recently_used_entries(tmp_path):
+    for used, key in enumerate(["old", "mid", "new"]):
+        for extension in (".qpy", ".npz"):
+            path = str(tmp_path / f"{key}{extension}")
+            write_atomic(path, lambda f: f.write("x" * 10))
+            os.utime(path, (used, used))
+    trim_directory(str(tmp_path), (".qpy", ".npz"), max_bytes=45)
+    assert sorted(os.listdir(tmp_path)) == ["mid.npz", "mid.qpy", "new.npz", "new.qpy"]
+
+def test_circuit_cache_round_trip_and_eviction(tmp_path):
+    qc = QuantumCircuit(2)
+    qc.cx(0, 1)
+    cache = CircuitCache(str(tmp_path))
+    cache.put("key", qc, np.array([[0, 1]]))
+    cached, interactions = cache.get("key")
+    assert cached == qc and interactions.tolist() == [[0, 1]]
+    (tmp_path / "key.npz").unlink()  # evicted by another process halfway
+    assert cache.get("key") is None
+    cache.evict()
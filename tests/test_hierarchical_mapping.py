@@ -0,0 +1,15 @@
+from qiskit.converters import circuit_to_dag
+
+from conftest import random_circuit
+from lib.distributed_coupling_map import distributed_topology
+from lib.hierarchical_mapping import HierarchicalMapping
+
+def test_map_is_injective_and_complete():
+    topology = distributed_topology("grid", 9, 4)
+    circuit = random_circuit(20, 120, seed=3)
+    initial_map = HierarchicalMapping(topology, circuit_to_dag(circuit), workers=1, beam_width=8).get_best_qpi_layout()
+    logical = [logical for logical, _ in initial_map]
+    physical = [physical for _, physical in initial_map]
+    assert sorted(logical) == list(range(circuit.num_qubits))
+    assert len(set(physical)) == len(physical)
+    assert all(0 <= phy < topology.size for phy in physical)
@@ -0,0 +1,44 @@
+import time
+import numpy as np
+import pytest
+from qiskit.converters import circuit_to_dag
+
+from conftest import random_circuit
+from lib.distributed_coupling_map import distributed_topology
+from lib.interaction_mapping import InteractionMapping
+from lib.timer_helper import Profiler
+
+def canonical_keys(mapping: InteractionMapping, symmetry) -> set:
+    keys = set()
+    for maps in mapping.maps:
+        logicals, physicals = np.array(maps, dtype=np.int64).T
+        keys.add(symmetry.canonical_key(logicals, physicals))
+    return keys
+
+def test_symmetric_pruning_keeps_one_map_per_class():
+    topology = distributed_topology("t_horizontal", 5, 2)
+    dag = circuit_to_dag(random_circuit(9, 40, seed=1))
+    full = InteractionMapping(topology, dag)
+    profiler = Profiler()
+    pruned = InteractionMapping(topology, dag, symmetry=True, profiler=profiler)
+    assert profiler.counters["mapping_symmetric_pruned"] > 0
+    assert len(pruned.maps) < len(full.maps)
+    # same best QPI rank and every map of the full search is a symmetric image of a kept one
+    assert max(pruned.qpi_rank.values()) == max(full.qpi_rank.values())
+    assert canonical_keys(full, pruned.symmetry) == canonical_keys(pruned, pruned.symmetry)
+
+def test_deadline_is_checked_inside_a_step():
+    # without a beam width one step of this search expands thousands of tied maps
+    topology = distributed_topology("full", 5, 4)
+    dag = circuit_to_dag(random_circuit(15, 120, seed=1))
+    start = time.perf_counter()
+    mapping = InteractionMapping(topology, dag, deadline=0.05)
+    assert time.perf_counter() - start < 0.5
+    assert mapping.deadline_reached
+    assert sorted(logical for logical, _ in mapping.get_best_qpi_layout()) == list(range(15))
+
+@pytest.mark.parametrize("symmetry", [False, True])
+def test_circuit_larger_than_device_raises(symmetry):
+    topology = distributed_topology("grid", 8, 3)  # 18 physical qubits
+    with pytest.raises(ValueError):
+        InteractionMapping(topology, circuit_to_dag(random_circuit(20, 40, seed=1)), beam_width=8, symmetry=symmetry)
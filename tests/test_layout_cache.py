@@ -0,0 +1,45 @@
+from qiskit.converters import circuit_to_dag
+
+from lib.distributed_coupling_map import distributed_topology
+from lib.interaction_mapping import two_qubit_interactions
+from lib.layout_cache import LayoutCache
+
+def test_memory_and_disk_hits(circuit, tmp_path):
+    topology = distributed_topology("grid", 9, 2)
+    interactions = two_qubit_interactions(circuit_to_dag(circuit))
+    key = LayoutCache.key(interactions, circuit.num_qubits, topology, {"beam_width": 8})
+    layout = [(logical, logical) for logical in range(circuit.num_qubits)]
+
+    cache = LayoutCache(directory=str(tmp_path))
+    assert cache.get(key) is None
+    cache.put(key, layout)
+    assert cache.get(key) == layout
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # a new process only has the directory
+    reopened = LayoutCache(directory=str(tmp_path))
+    assert reopened.get_or_create(key, lambda: None) == layout
+    assert (reopened.hits, reopened.misses) == (1, 0)
+    assert key != LayoutCache.key(interactions, circuit.num_qubits, topology, {"beam_width": 4})
+
+class Mapping:
+    def __init__(self, layout, deadline_reached):
+        self.layout = layout
+        self.deadline_reached = deadline_reached
+
+    def get_best_qpi_layout(self):
+        return self.layout
+
+def test_layout_after_deadline_is_not_stored(tmp_path):
+    cache = LayoutCache(directory=str(tmp_path))
+    assert cache.get_or_create("key", lambda: Mapping([(0, 1), (1, 0)], True)) == [(0, 1), (1, 0)]
+    assert cache.get("key") is None
+    assert cache.get_or_create("key", lambda: Mapping([(0, 0), (1, 1)], False)) == [(0, 0), (1, 1)]
+    assert LayoutCache(directory=str(tmp_path)).get("key") == [(0, 0), (1, 1)]
+
+def test_evicted_entry_is_a_miss(tmp_path):
+    cache = LayoutCache(max_entries=0, directory=str(tmp_path))
+    cache.put("key", [(0, 0)])
+    (tmp_path / "key.json").unlink()  # evicted by another process
+    assert cache.get("key") is None
+    cache.evict()
@@ -0,0 +1,45 @@
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from qiskit.transpiler import CouplingMap
+from qiskit.transpiler.exceptions import TranspilerError
+
+from conftest import random_circuit, route_circuit
+from lib.lookahead_routing import DynamicLookaheadSwap, GateIndex, stream_layers
+from lib.routing_validation import validate_routing
+from lib.timer_helper import Profiler
+
+def test_window_deeper_than_circuit_matches_full_mode(circuit):
+    full, _ = route_circuit(circuit)
+    windowed, _ = route_circuit(circuit, window=circuit.depth() + 1)
+    assert windowed == full
+
+def test_layers_match_dag_layers():
+    circuit = random_circuit(8, 60, seed=2)
+    circuit.measure_all()
+    dag = circuit_to_dag(circuit)
+
+    def gates(layer):
+        # dag.layers() copies the nodes into a DAG per layer, so compare names and qubits
+        return sorted((node.name, tuple(dag.find_bit(qubit).index for qubit in node.qargs)) for node in layer)
+
+    expected = [gates(layer["graph"].op_nodes()) for layer in dag.layers()]
+    assert [gates(layer) for layer in stream_layers(dag)] == expected
+    index = GateIndex(dag)
+    assert [gates(index.op_gates[start:end]) for start, end in zip(index.layer_ptr[:-1], index.layer_ptr[1:])] == expected
+
+def test_escape_mode_routes_stalled_gates(circuit):
+    # stall_limit=0 sends every blocked gate straight to the shortest-path escape
+    profiler = Profiler()
+    routed, initial_map = route_circuit(circuit, stall_limit=0, profiler=profiler)
+    assert profiler.counters["escape_swaps"] > 0
+    assert validate_routing(circuit, routed, initial_layout=initial_map)["equivalent"] is True
+
+def test_disconnected_qubits_raise():
+    coupling_map = CouplingMap([(0, 1), (1, 0), (2, 3), (3, 2)])
+    qc = QuantumCircuit(4)
+    qc.cx(0, 1)
+    qc.cx(0, 2)
+    for window in (None, 1):
+        with pytest.raises(TranspilerError):
+            DynamicLookaheadSwap(coupling_map, window=window).run(circuit_to_dag(qc))
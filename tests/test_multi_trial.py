@@ -0,0 +1,18 @@
+from conftest import random_circuit
+from lib.distributed_coupling_map import distributed_topology
+from lib.multi_trial import route_trial, run_trials
+
+def test_seeded_trials_are_reproducible():
+    topology = distributed_topology("grid", 9, 2)
+    qc = random_circuit(10, 80, seed=6)
+    options = {"mapping_options": {"beam_width": 8}, "workers": 1}
+    first = run_trials(qc, topology, trials=4, seed=3, **options)
+    second = run_trials(qc, topology, trials=4, seed=3, **options)
+    assert first["circuit"] == second["circuit"]
+    assert (first["seed"], first["trial_swaps"]) == (second["seed"], second["trial_swaps"])
+    # trial 0 is the deterministic run, so the best is never worse than it
+    single = route_trial(qc, topology, mapping_options={"beam_width": 8})
+    assert first["trial_swaps"][0] == single["swap"]
+    assert first["swap"] <= single["swap"]
+    seeded = [route_trial(qc, topology, seed=5, mapping_options={"beam_width": 8})["circuit"] for _ in range(2)]
+    assert seeded[0] == seeded[1]
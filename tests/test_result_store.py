@@ -0,0 +1,37 @@
+from lib.result_store import ResultStore
+
+def record(layout: str, swap: int) -> dict:
+    return {"circuit_size": 10, "benchmark": "ghz", "layout": layout, "routing": "lookahead", "swap": swap}
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    store = ResultStore(str(tmp_path / "benchmarking.jsonl"))
+    store.append(record("grid_9_2", 3))
+    with open(store.filename, "a") as result_file:
+        result_file.write('{"circuit_size": 10, "bench')  # interrupted write
+    assert store.load() == [record("grid_9_2", 3)]
+
+    # the next append starts on a new line, the partial one stays skipped
+    store.append(record("ring_9_2", 5))
+    assert store.load() == [record("grid_9_2", 3), record("ring_9_2", 5)]
+
+def test_completed_keys_resume(tmp_path):
+    store = ResultStore(str(tmp_path / "benchmarking.jsonl"))
+    store.append(record("grid_9_2", 3))
+    resumed = ResultStore(store.filename)
+    assert resumed.completed_keys() == {(10, "ghz", "grid_9_2", "lookahead")}
+    assert resumed.load(layout="ring_9_2") == []
+
+def test_import_nested_dict_round_trip(tmp_path):
+    dict_benchmark = {"5": {"ghz": {
+        "init": {"size": 9, "depth": 6, "interval": 0.1},
+        "grid_9_2": {"basic_swap": 6, "basic_depth": 8, "lookahead_swap": 3, "lookahead_remote_swap": 0},
+    }}}
+    store = ResultStore(str(tmp_path / "benchmarking.jsonl"))
+    assert store.import_nested_dict(dict_benchmark) == 2
+    # swap stays in the CX unit of the legacy tree, swap_gates counts SWAP gates like the new cells
+    layout = store.to_nested_dict()["5"]["ghz"]["grid_9_2"]
+    assert (layout["basic_swap"], layout["basic_swap_gates"]) == (6, 2)
+    assert (layout["lookahead_swap"], layout["lookahead_swap_gates"]) == (3, 1)
+    assert {field: value for field, value in layout.items() if not field.endswith("_swap_gates")} == dict_benchmark["5"]["ghz"]["grid_9_2"]
+    assert store.import_nested_dict(dict_benchmark) == 0  # already in the store
+    assert store.completed_keys() == {(5, "ghz", "grid_9_2", "basic"), (5, "ghz", "grid_9_2", "lookahead")}
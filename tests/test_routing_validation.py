@@ -0,0 +1,13 @@
+from conftest import route_circuit
+from lib.routing_validation import validate_routing
+
+def test_routed_circuit_is_equivalent(circuit):
+    routed, initial_map = route_circuit(circuit)
+    assert routed.count_ops().get("swap", 0) > 0
+    assert validate_routing(circuit, routed, initial_layout=initial_map)["equivalent"] is True
+
+def test_missing_gate_is_detected(circuit):
+    routed, initial_map = route_circuit(circuit)
+    index = next(index for index, instruction in enumerate(routed.data) if instruction.operation.name == "cx")
+    del routed.data[index]
+    assert validate_routing(circuit, routed, initial_layout=initial_map)["equivalent"] is False
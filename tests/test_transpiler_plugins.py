@@ -0,0 +1,26 @@
+from qiskit.transpiler import PassManagerConfig
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+from conftest import random_circuit
+from lib.distributed_coupling_map import distributed_topology
+from lib.routing_validation import validate_routing
+from lib.transpiler_plugins import InteractionLayoutPlugin, LookaheadRoutingPlugin, generate_interaction_pass_manager
+
+def test_interaction_pass_manager_output():
+    topology = distributed_topology("grid", 9, 2)
+    qc = random_circuit(10, 80, seed=4)
+    routed = generate_interaction_pass_manager(topology.backend, topology=topology, mapping_options={"beam_width": 8}).run(qc)
+    result = validate_routing(qc, routed, coupling_map=topology.coupling_map)
+    assert result["equivalent"] is True and result["connected"] is True
+
+def test_stage_plugins_output():
+    # the stages the entry points would load, swapped into a preset pass manager
+    topology = distributed_topology("ring", 7, 3)
+    qc = random_circuit(8, 60, seed=5)
+    pass_manager = generate_preset_pass_manager(0, backend=topology.backend)
+    config = PassManagerConfig.from_backend(topology.backend)
+    pass_manager.layout = InteractionLayoutPlugin().pass_manager(config, 0)
+    pass_manager.routing = LookaheadRoutingPlugin().pass_manager(config, 0)
+    routed = pass_manager.run(qc)
+    result = validate_routing(qc, routed, coupling_map=topology.coupling_map)
+    assert result["equivalent"] is True and result["connected"] is True